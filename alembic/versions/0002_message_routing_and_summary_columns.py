@@ -0,0 +1,42 @@
+"""Message routing, pinning and summary columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.add_column(sa.Column("model", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("routing_reason", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column(
+            "pinned", sa.Boolean(), nullable=False, server_default=sa.false()
+        ))
+        batch_op.add_column(sa.Column(
+            "is_summary", sa.Boolean(), nullable=False, server_default=sa.false()
+        ))
+        batch_op.add_column(sa.Column("summary_until_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_column("summary_until_id")
+        batch_op.drop_column("is_summary")
+        batch_op.drop_column("pinned")
+        batch_op.drop_column("routing_reason")
+        batch_op.drop_column("model")
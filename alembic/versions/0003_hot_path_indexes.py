@@ -0,0 +1,46 @@
+"""Composite indexes for history loads and conversation listing
+
+- messages(conversation_id, id): context building, pinned/summary lookups
+  and per-conversation counts, all keyed on id within a conversation
+- messages(conversation_id, created_at, id): full history in order
+- conversations(user_id, created_at, id): the keyset-paginated listing
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_messages_conversation_id_id", "messages", ["conversation_id", "id"]
+    )
+    op.create_index(
+        "ix_messages_conversation_id_created_at",
+        "messages",
+        ["conversation_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_conversations_user_id_created_at",
+        "conversations",
+        ["user_id", "created_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_conversations_user_id_created_at", table_name="conversations")
+    op.drop_index("ix_messages_conversation_id_created_at", table_name="messages")
+    op.drop_index("ix_messages_conversation_id_id", table_name="messages")
@@ -0,0 +1,56 @@
+"""Denormalized message counters on conversations
+
+Adds message_count and last_message_at (total_tokens already exists) and
+backfills all three from messages. Summary rows are not counted.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.add_column(sa.Column(
+            "message_count", sa.Integer(), nullable=False, server_default="0"
+        ))
+        batch_op.add_column(sa.Column("last_message_at", sa.DateTime(), nullable=True))
+
+    op.execute("""
+        UPDATE conversations SET
+            message_count = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                  AND NOT messages.is_summary
+            ),
+            total_tokens = (
+                SELECT COALESCE(SUM(messages.tokens), 0) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                  AND NOT messages.is_summary
+            ),
+            last_message_at = (
+                SELECT MAX(messages.created_at) FROM messages
+                WHERE messages.conversation_id = conversations.id
+                  AND NOT messages.is_summary
+            )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.drop_column("last_message_at")
+        batch_op.drop_column("message_count")
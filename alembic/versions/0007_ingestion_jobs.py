@@ -0,0 +1,48 @@
+"""Background PDF ingestion jobs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 11:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "ingestion_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "RUNNING", "SUCCEEDED", "FAILED", name="ingestionstatus"),
+            nullable=False
+        ),
+        sa.Column("pages_total", sa.Integer(), nullable=True),
+        sa.Column("pages_done", sa.Integer(), nullable=False),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_ingestion_jobs_status", "ingestion_jobs", ["status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_ingestion_jobs_status", table_name="ingestion_jobs")
+    op.drop_table("ingestion_jobs")
+    sa.Enum(name="ingestionstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,97 @@
+"""Content-hash deduplication of documents and shared extracted text
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 12:30:00
+
+"""
+import hashlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    document_texts = op.create_table(
+        "document_texts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("sha256", sa.String(64), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_document_texts_sha256", "document_texts", ["sha256"], unique=True)
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column("sha256", sa.String(64), nullable=True))
+        batch_op.add_column(sa.Column("text_id", sa.Integer(), nullable=True))
+
+    # Move existing text into document_texts, one row per distinct content.
+    # The upload bytes of existing documents are gone, so their sha256 stays NULL.
+    bind = op.get_bind()
+    documents = sa.table(
+        "documents",
+        sa.column("id", sa.Integer()),
+        sa.column("content", sa.Text()),
+        sa.column("text_id", sa.Integer()),
+    )
+    text_ids = {}
+    for document_id, content in bind.execute(sa.select(documents.c.id, documents.c.content)).all():
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if digest not in text_ids:
+            text_ids[digest] = bind.execute(
+                document_texts.insert()
+                .values(sha256=digest, content=content, ref_count=0, created_at=datetime.utcnow())
+                .returning(document_texts.c.id)
+            ).scalar_one()
+        bind.execute(
+            documents.update().where(documents.c.id == document_id).values(text_id=text_ids[digest])
+        )
+        bind.execute(
+            document_texts.update()
+            .where(document_texts.c.id == text_ids[digest])
+            .values(ref_count=document_texts.c.ref_count + 1)
+        )
+
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column("text_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key(
+            "fk_documents_text_id_document_texts", "document_texts", ["text_id"], ["id"]
+        )
+        batch_op.drop_column("content")
+    op.create_index("ix_documents_sha256", "documents", ["sha256"], unique=True)
+
+    with op.batch_alter_table("ingestion_jobs") as batch_op:
+        batch_op.add_column(sa.Column("sha256", sa.String(64), nullable=True))
+        batch_op.create_index("ix_ingestion_jobs_sha256", ["sha256"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("ingestion_jobs") as batch_op:
+        batch_op.drop_index("ix_ingestion_jobs_sha256")
+        batch_op.drop_column("sha256")
+
+    op.drop_index("ix_documents_sha256", table_name="documents")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column("content", sa.Text(), nullable=True))
+    op.execute(
+        "UPDATE documents SET content = "
+        "(SELECT content FROM document_texts WHERE document_texts.id = documents.text_id)"
+    )
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column("content", existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint("fk_documents_text_id_document_texts", type_="foreignkey")
+        batch_op.drop_column("text_id")
+        batch_op.drop_column("sha256")
+    op.drop_index("ix_document_texts_sha256", table_name="document_texts")
+    op.drop_table("document_texts")
@@ -0,0 +1,111 @@
+"""Chunk store for RAG, built at ingestion time
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 13:40:00
+
+"""
+import re
+from typing import List, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of the chunker and token estimate as of this revision, so
+# later changes to the application code cannot alter what the backfill writes
+CHUNK_SIZE = 500
+_PRETOKEN = re.compile(
+    r"'(?:[sdmt]|ll|ve|re)|[^\W\d_]+|\d{1,3}|[^\s\w]+|\s*\n+|\s+",
+    re.IGNORECASE,
+)
+
+
+def _chunk_spans(text: str) -> List[Tuple[int, int, str]]:
+    """(start, end, chunk) for chunks of about CHUNK_SIZE characters"""
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    start = end = 0
+    for match in re.finditer(r"\S+", text):
+        if not current_chunk:
+            start = match.start()
+        current_chunk.append(match.group())
+        current_length += len(match.group()) + 1
+        end = match.end()
+        if current_length >= CHUNK_SIZE:
+            chunks.append((start, end, " ".join(current_chunk)))
+            current_chunk = []
+            current_length = 0
+    if current_chunk:
+        chunks.append((start, end, " ".join(current_chunk)))
+    return chunks
+
+
+def _count_tokens(text: str) -> int:
+    """Pre-tokenizer estimate of BPE tokens"""
+    count = 0
+    for piece in _PRETOKEN.findall(text):
+        if piece[0].isalpha():
+            count += 1 + (len(piece) - 1) // 6 if piece.isascii() else len(piece)
+        elif piece.isdigit():
+            count += 1
+        elif piece.isspace():
+            count += 1 if "\n" in piece else 0
+        else:
+            count += 1 + (len(piece) - 1) // 2
+    return count
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    document_chunks = op.create_table(
+        "document_chunks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "text_id",
+            sa.Integer(),
+            sa.ForeignKey("document_texts.id", ondelete="CASCADE"),
+            nullable=False
+        ),
+        sa.Column("ordinal", sa.Integer(), nullable=False),
+        sa.Column("start_offset", sa.Integer(), nullable=False),
+        sa.Column("end_offset", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("tokens", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_document_chunks_text_id_ordinal", "document_chunks", ["text_id", "ordinal"], unique=True
+    )
+
+    # Chunk the texts stored before this revision the way ingestion did then
+    bind = op.get_bind()
+    document_texts = sa.table(
+        "document_texts", sa.column("id", sa.Integer()), sa.column("content", sa.Text())
+    )
+    for text_id, content in bind.execute(sa.select(document_texts.c.id, document_texts.c.content)).all():
+        rows = [
+            {
+                "text_id": text_id,
+                "ordinal": ordinal,
+                "start_offset": start,
+                "end_offset": end,
+                "content": chunk,
+                "tokens": _count_tokens(chunk)
+            }
+            for ordinal, (start, end, chunk) in enumerate(_chunk_spans(content))
+        ]
+        if rows:
+            bind.execute(document_chunks.insert(), rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_document_chunks_text_id_ordinal", table_name="document_chunks")
+    op.drop_table("document_chunks")
@@ -0,0 +1,144 @@
+"""Inverted index of document chunks for BM25 retrieval
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 15:00:00
+
+"""
+import re
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the BM25 term extraction as of this revision, so later
+# changes to the application's tokenizer cannot alter what the backfill writes
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because
+been before being below between both but by can could did do does doing down
+during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself
+no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your yours
+yourself yourselves
+""".split())
+
+_WORD = re.compile(r"[^\W_]+")
+
+# (suffix, replacement, shortest stem left behind)
+_SUFFIXES = (
+    ("ies", "y", 2),
+    ("sses", "ss", 2),
+    ("ing", "", 3),
+    ("ed", "", 3),
+    ("xes", "x", 1),
+    ("shes", "sh", 1),
+    ("es", "e", 3),
+    ("s", "", 3),
+)
+
+
+def _stem(word: str) -> str:
+    for suffix, replacement, shortest in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= shortest:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                return word
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def _term_frequencies(text: str) -> Counter:
+    return Counter(_stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    chunk_postings = op.create_table(
+        "chunk_postings",
+        sa.Column(
+            "text_id",
+            sa.Integer(),
+            sa.ForeignKey("document_texts.id", ondelete="CASCADE"),
+            primary_key=True
+        ),
+        sa.Column("term", sa.String(), primary_key=True),
+        sa.Column(
+            "chunk_id",
+            sa.Integer(),
+            sa.ForeignKey("document_chunks.id", ondelete="CASCADE"),
+            primary_key=True
+        ),
+        sa.Column("tf", sa.Integer(), nullable=False),
+        sqlite_with_rowid=False,
+    )
+    op.add_column(
+        "document_chunks", sa.Column("term_count", sa.Integer(), server_default="0", nullable=False)
+    )
+    op.add_column(
+        "document_texts", sa.Column("chunk_count", sa.Integer(), server_default="0", nullable=False)
+    )
+    op.add_column(
+        "document_texts", sa.Column("term_count", sa.Integer(), server_default="0", nullable=False)
+    )
+
+    # Index the chunks stored before this revision the way ingestion did then
+    bind = op.get_bind()
+    document_chunks = sa.table(
+        "document_chunks",
+        sa.column("id", sa.Integer()),
+        sa.column("text_id", sa.Integer()),
+        sa.column("content", sa.Text()),
+        sa.column("term_count", sa.Integer()),
+    )
+    document_texts = sa.table(
+        "document_texts",
+        sa.column("id", sa.Integer()),
+        sa.column("chunk_count", sa.Integer()),
+        sa.column("term_count", sa.Integer()),
+    )
+    text_ids = bind.execute(sa.select(document_chunks.c.text_id).distinct()).scalars().all()
+    for text_id in text_ids:
+        chunks = bind.execute(
+            sa.select(document_chunks.c.id, document_chunks.c.content)
+            .where(document_chunks.c.text_id == text_id)
+        ).all()
+        frequencies = [_term_frequencies(content) for _, content in chunks]
+        postings = [
+            {"text_id": text_id, "term": term, "chunk_id": chunk_id, "tf": tf}
+            for (chunk_id, _), counts in zip(chunks, frequencies)
+            for term, tf in counts.items()
+        ]
+        if postings:
+            bind.execute(chunk_postings.insert(), postings)
+        lengths = [sum(counts.values()) for counts in frequencies]
+        bind.execute(
+            document_chunks.update()
+            .where(document_chunks.c.id == sa.bindparam("chunk_id"))
+            .values(term_count=sa.bindparam("length")),
+            [{"chunk_id": chunk_id, "length": length} for (chunk_id, _), length in zip(chunks, lengths)]
+        )
+        bind.execute(
+            document_texts.update()
+            .where(document_texts.c.id == text_id)
+            .values(chunk_count=len(chunks), term_count=sum(lengths))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("chunk_postings")
+    with op.batch_alter_table("document_texts") as batch_op:
+        batch_op.drop_column("term_count")
+        batch_op.drop_column("chunk_count")
+    with op.batch_alter_table("document_chunks") as batch_op:
+        batch_op.drop_column("term_count")
@@ -0,0 +1,56 @@
+"""Never reuse message ids on SQLite, so archived messages keep theirs
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 16:00:00
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, Sequence[str], None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        # Sequences never hand out an id twice
+        return
+
+    with op.batch_alter_table(
+        "messages", recreate="always", table_kwargs={"sqlite_autoincrement": True}
+    ):
+        pass
+
+    # Rows already moved into archives must not have their ids taken by
+    # new messages either; archive payloads are zlib-compressed JSON arrays
+    max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM messages")).scalar()
+    for (payload,) in bind.execute(sa.text("SELECT payload FROM message_archives")):
+        for row in json.loads(zlib.decompress(payload)):
+            max_id = max(max_id, row["id"])
+    bind.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'messages'"))
+    bind.execute(
+        sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('messages', :seq)"),
+        {"seq": max_id}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    with op.batch_alter_table(
+        "messages", recreate="always", table_kwargs={"sqlite_autoincrement": False}
+    ):
+        pass
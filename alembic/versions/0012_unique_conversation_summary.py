@@ -0,0 +1,45 @@
+"""At most one summary row per conversation
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, Sequence[str], None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent summarizers could leave several; keep the one covering the
+    # most history (the newest on a tie)
+    op.execute(
+        "DELETE FROM messages WHERE is_summary AND EXISTS ("
+        "SELECT 1 FROM messages AS other"
+        " WHERE other.is_summary AND other.conversation_id = messages.conversation_id"
+        " AND (coalesce(other.summary_until_id, 0) > coalesce(messages.summary_until_id, 0)"
+        " OR (coalesce(other.summary_until_id, 0) = coalesce(messages.summary_until_id, 0)"
+        " AND other.id > messages.id)))"
+    )
+    op.create_index(
+        "uq_messages_conversation_id_summary",
+        "messages",
+        ["conversation_id"],
+        unique=True,
+        sqlite_where=sa.text("is_summary"),
+        postgresql_where=sa.text("is_summary"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_messages_conversation_id_summary", table_name="messages")
@@ -1,7 +1,7 @@
 """API dependencies"""
-from app.database import get_db
+from app.database import get_async_db, get_db
 
 # You can add more dependencies here as needed
 # For example: authentication, authorization, etc.
 
-__all__ = ["get_db"]
\ No newline at end of file
+__all__ = ["get_db", "get_async_db"]
\ No newline at end of file
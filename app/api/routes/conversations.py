@@ -1,31 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models.conversation import ConversationMode
 from app.schemas.conversation import (
+    ConversationBulkDelete,
     ConversationCreate,
     MessageAdd,
+    MessagePin,
     RAGMessageAdd
 )
 from app.services.conversation_service import ConversationService
+from app.services.purge_service import purge_in_background
+from app.services.summary_service import summarize_in_background
+from app.services.transfer_service import TransferService, iter_lines
 from app.models.user import User
 
 router = APIRouter()
 
-def get_default_user(db: Session) -> User:
-    user = db.query(User).filter(User.id == 1).first()
+async def get_default_user(db: AsyncSession) -> User:
+    result = await db.execute(select(User).where(User.id == 1))
+    user = result.scalars().first()
     if not user:
         user = User(id=1, email="demo@example.com", name="Demo User")
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     return user
 
+
+def sse_response(events: AsyncIterator[dict]) -> StreamingResponse:
+    """Encode service events as Server-Sent Events"""
+    async def encode():
+        try:
+            async for event in events:
+                name = event.pop("event")
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        encode(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     request: ConversationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = get_default_user(db)
+    user = await get_default_user(db)
     service = ConversationService(db)
 
     return await service.create_conversation(
@@ -36,52 +65,162 @@ async def create_conversation(
     )
 
 
+@router.get("/export")
+async def export_conversations(db: AsyncSession = Depends(get_async_db)):
+    """Stream the current user's conversations and messages as NDJSON"""
+    user = await get_default_user(db)
+    return StreamingResponse(
+        TransferService(db).export_ndjson(user_id=user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.ndjson"'}
+    )
+
+
+@router.post("/import", status_code=status.HTTP_201_CREATED)
+async def import_conversations(
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Import an NDJSON export (request body) as new conversations of the current user"""
+    user = await get_default_user(db)
+    try:
+        return await TransferService(db).import_ndjson(
+            iter_lines(http_request.stream()), user_id=user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/{conversation_id}/messages")
 async def add_message(
     conversation_id: int,
     request: MessageAdd,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     service = ConversationService(db)
-    return await service.add_message(conversation_id, request.content)
+    # Fold older turns into the rolling summary once the reply is sent
+    background_tasks.add_task(summarize_in_background, conversation_id)
+    try:
+        if stream:
+            return sse_response(
+                await service.stream_message(conversation_id, request.content)
+            )
+        return await service.add_message(conversation_id, request.content)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/{conversation_id}")
-def get_conversation(
+async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
 ):
     service = ConversationService(db)
-    convo = service.get_conversation(conversation_id)
+    convo = await service.get_conversation(conversation_id, limit=limit)
     if not convo:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return convo
 
 
+@router.get("/{conversation_id}/messages")
+async def list_messages(
+    conversation_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
+):
+    service = ConversationService(db)
+    try:
+        page = await service.list_messages(conversation_id, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return page
+
+
+@router.put("/{conversation_id}/messages/{message_id}/pin")
+async def pin_message(
+    conversation_id: int,
+    message_id: int,
+    request: MessagePin,
+    db: AsyncSession = Depends(get_async_db)
+):
+    service = ConversationService(db)
+    message = await service.pin_message(conversation_id, message_id, request.pinned)
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
+
 @router.get("/")
-def list_conversations(db: Session = Depends(get_db)):
-    user = get_default_user(db)
+async def list_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    mode: Optional[ConversationMode] = None,
+    document_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    user = await get_default_user(db)
     service = ConversationService(db)
-    return service.list_conversations(user.id)
+    try:
+        return await service.list_conversations(
+            user.id, limit=limit, cursor=cursor, mode=mode, document_id=document_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/{conversation_id}/rag")
 async def add_rag_message(
     conversation_id: int,
     request: RAGMessageAdd,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     service = ConversationService(db)
-    return await service.add_rag_message(
-        conversation_id=conversation_id,
-        question=request.content
-    )
+    background_tasks.add_task(summarize_in_background, conversation_id)
+    try:
+        if stream:
+            return sse_response(
+                await service.stream_rag_message(
+                    conversation_id=conversation_id,
+                    question=request.content
+                )
+            )
+        return await service.add_rag_message(
+            conversation_id=conversation_id,
+            question=request.content
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/bulk-delete")
+async def delete_conversations(
+    request: ConversationBulkDelete,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    user = await get_default_user(db)
+    service = ConversationService(db)
+    deleted = await service.delete_conversations(request.conversation_ids, user.id)
+    if deleted:
+        background_tasks.add_task(purge_in_background)
+    return {"deleted": deleted}
 
 
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
 ):
     service = ConversationService(db)
-    if not service.delete_conversation(conversation_id):
+    if not await service.delete_conversation(conversation_id):
         raise HTTPException(status_code=404, detail="Conversation not found")
+    # Rows are removed after the response is sent
+    background_tasks.add_task(purge_in_background)
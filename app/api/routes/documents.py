@@ -1,14 +1,56 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.document_service import DocumentService
+from typing import Awaitable, Callable
 
-router = APIRouter()
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import get_async_db
+from app.repositories.document_repository import AsyncDocumentRepository
+from app.services.ingestion_service import IngestionService
 
-@router.post("/upload")
-def upload_document(
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadSizeRoute(APIRoute):
+    """
+    Refuses oversized bodies from their Content-Length before the form is
+    parsed: Starlette spools the whole upload before the handler runs, so
+    the size check while streaming it to disk alone comes too late.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def size_limited_handler(request: Request) -> Response:
+            length = request.headers.get("content-length")
+            if length is None and "transfer-encoding" in request.headers:
+                raise HTTPException(
+                    status_code=status.HTTP_411_LENGTH_REQUIRED,
+                    detail="Content-Length is required"
+                )
+            if length is not None and not length.isdigit():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid Content-Length"
+                )
+            if length is not None and int(length) > settings.upload_max_bytes + MULTIPART_OVERHEAD:
+                raise HTTPException(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    detail=f"File is larger than {settings.upload_max_bytes} bytes"
+                )
+            return await handler(request)
+
+        return size_limited_handler
+
+
+router = APIRouter(route_class=UploadSizeRoute)
+
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
+async def upload_document(
+    response: Response,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(
@@ -16,5 +58,35 @@ def upload_document(
             detail="Only PDF files are supported"
         )
 
-    service = DocumentService(db)
-    return service.upload_pdf(file)
+    service = IngestionService(db)
+    try:
+        result = await service.enqueue(file)
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # Already ingested: nothing was queued
+    if result.get("duplicate"):
+        response.status_code = status.HTTP_200_OK
+    return result
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    job = await IngestionService(db).get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not await AsyncDocumentRepository(db).delete(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
@@ -1,7 +1,26 @@
 from fastapi import APIRouter
+from app.services.llm_scheduler import get_llm_scheduler
+from app.services.llm_service import hedge_stats, in_flight
+from app.utils.circuit_breaker import breaker_stats
+from app.utils.latency import latency_stats
+from app.utils.llm_cache import get_llm_cache
 
 router = APIRouter()
 
 @router.get("/")
 def health_check():
     return {"status": "ok"}
+
+
+@router.get("/metrics")
+def metrics():
+    cache = get_llm_cache()
+    scheduler = get_llm_scheduler()
+    return {
+        "llm_cache": cache.stats() if cache else None,
+        "llm_single_flight": in_flight.stats(),
+        "llm_scheduler": scheduler.stats() if scheduler else None,
+        "llm_hedging": dict(hedge_stats),
+        "llm_latency": latency_stats(),
+        "llm_circuit_breakers": breaker_stats(),
+    }
@@ -0,0 +1,141 @@
+"""Maintenance commands
+
+Usage:
+    python -m app.cli reconcile-counters [--conversation-id ID]
+    python -m app.cli purge-deleted [--batch-size N]
+    python -m app.cli archive-inactive [--days N] [--limit N]
+    python -m app.cli export [--user-id ID] [--output FILE]
+    python -m app.cli import FILE [--user-id ID]
+"""
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from app.database import AsyncSessionLocal, SessionLocal, init_db
+from app.repositories.conversation_repository import ConversationRepository
+from app.services.archive_service import ArchiveService
+from app.services.purge_service import PurgeService
+from app.services.transfer_service import TransferService
+
+
+def reconcile_counters(args: argparse.Namespace) -> int:
+    """Recompute message_count/total_tokens/last_message_at where they drifted"""
+    db = SessionLocal()
+    try:
+        fixed = ConversationRepository(db).reconcile_counters(args.conversation_id)
+    finally:
+        db.close()
+    print(f"Reconciled {fixed} conversation(s)")
+    return 0
+
+
+def purge_deleted(args: argparse.Namespace) -> int:
+    """Remove the rows of soft-deleted conversations now"""
+    async def purge():
+        async with AsyncSessionLocal() as db:
+            return await PurgeService(db, args.batch_size).purge()
+
+    print(f"Purged {asyncio.run(purge())} row(s)")
+    return 0
+
+
+def archive_inactive(args: argparse.Namespace) -> int:
+    """Move messages of idle conversations into the compressed archive"""
+    async def archive():
+        async with AsyncSessionLocal() as db:
+            return await ArchiveService(db).archive_inactive(args.days, args.limit)
+
+    result = asyncio.run(archive())
+    print(f"Archived {result['messages']} message(s) from {result['conversations']} conversation(s)")
+    return 0
+
+
+def export_conversations(args: argparse.Namespace) -> int:
+    """Write conversations and messages as NDJSON to --output or stdout"""
+    async def export(out):
+        async with AsyncSessionLocal() as db:
+            async for line in TransferService(db).export_ndjson(args.user_id):
+                out.write(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            asyncio.run(export(out))
+    else:
+        asyncio.run(export(sys.stdout))
+    return 0
+
+
+def import_conversations(args: argparse.Namespace) -> int:
+    """Load an NDJSON export as new conversations"""
+    async def lines(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await TransferService(db).import_ndjson(lines(args.file), args.user_id)
+
+    try:
+        result = asyncio.run(load())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Imported {result['conversations']} conversation(s), {result['messages']} message(s)")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = commands.add_parser(
+        "reconcile-counters",
+        help="Repair denormalized conversation counters from messages"
+    )
+    reconcile.add_argument("--conversation-id", type=int, default=None)
+    reconcile.set_defaults(handler=reconcile_counters)
+
+    purge = commands.add_parser(
+        "purge-deleted",
+        help="Remove soft-deleted conversations and their messages"
+    )
+    purge.add_argument("--batch-size", type=int, default=None)
+    purge.set_defaults(handler=purge_deleted)
+
+    archive = commands.add_parser(
+        "archive-inactive",
+        help="Archive messages of conversations idle for --days"
+    )
+    archive.add_argument("--days", type=int, default=None)
+    archive.add_argument("--limit", type=int, default=None)
+    archive.set_defaults(handler=archive_inactive)
+
+    export = commands.add_parser(
+        "export",
+        help="Stream conversations and messages as NDJSON"
+    )
+    export.add_argument("--user-id", type=int, default=None)
+    export.add_argument("--output", default=None, help="file to write (default: stdout)")
+    export.set_defaults(handler=export_conversations)
+
+    load = commands.add_parser(
+        "import",
+        help="Import an NDJSON export as new conversations"
+    )
+    load.add_argument("file")
+    load.add_argument("--user-id", type=int, default=None, help="owner of the imported conversations")
+    load.set_defaults(handler=import_conversations)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    init_db()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from typing import Optional
+from typing import List, Optional
 
 
 
@@ -11,6 +11,74 @@ class Settings(BaseSettings):
     groq_api_key: Optional[str] = None
     llm_model: str = "llama-3.3-70b-versatile"
     llm_max_tokens: int = 1024
+    llm_timeout: float = 60.0
+    llm_max_concurrency: int = 32
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_max_bytes: int = 16 * 1024 * 1024
+    llm_cache_ttl_seconds: float = 3600.0
+    llm_scheduler_enabled: bool = True
+    llm_rpm_limit: int = 30
+    llm_tpm_limit: int = 12000
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_samples: int = 20
+    llm_hedge_max_in_flight: int = 4
+    llm_breaker_error_threshold: float = 0.5
+    llm_breaker_min_requests: int = 10
+    llm_breaker_window: int = 50
+    llm_breaker_cooldown_seconds: float = 30.0
+    llm_fallback_model: Optional[str] = None
+    llm_router_enabled: bool = True
+    llm_fast_models: List[str] = ["llama-3.1-8b-instant"]
+    llm_router_max_fast_tokens: int = 512
+    tokenizer_path: Optional[str] = None
+    context_max_tokens: int = 3000
+    summary_enabled: bool = True
+    summary_trigger_tokens: int = 1500
+    summary_keep_recent_tokens: int = 1500
+    # Most raw tokens folded per summary pass, oldest first; keeps the prompt in the context window
+    summary_max_fold_tokens: int = 6000
+    # Soft-deleted conversations are purged in batches of this many rows
+    purge_batch_size: int = 500
+    # Conversations idle this long are moved to the compressed archive
+    archive_after_days: int = 90
+    archive_batch_size: int = 100
+    # Rows fetched per round trip by exports and inserted per executemany by imports
+    transfer_batch_size: int = 1000
+    # PDF uploads are streamed to upload_dir and ingested by a bounded pool
+    upload_dir: str = "uploads"
+    upload_chunk_size: int = 1024 * 1024
+    upload_max_bytes: int = 100 * 1024 * 1024
+    ingestion_workers: int = 2
+    ingestion_max_pending: int = 100
+    # RUNNING jobs without progress for this long are requeued on startup;
+    # live workers bump their jobs every heartbeat, which must be well below it
+    ingestion_stale_seconds: int = 600
+    ingestion_heartbeat_seconds: float = 60.0
+    # Page text extraction runs in a process pool (0 = one process per CPU)
+    pdf_extract_processes: int = 0
+    pdf_pages_per_task: int = 8
+    pdf_page_timeout_seconds: float = 30.0
+    # Connection pool (file databases and servers)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    # SQLite production profile, applied to every new connection
+    sqlite_production: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    # Opt-in: route all writes of a process through one connection. Usually
+    # slower than the production profile alone (see README and
+    # benchmarks/sqlite_concurrency.py); enable only if it measures faster
+    sqlite_dedicated_writer: bool = False
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = True
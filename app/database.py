@@ -1,15 +1,171 @@
 """Database configuration"""
-from sqlalchemy import create_engine
+import os
+from typing import List
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from app.config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+# Async drivers for the sync URLs we accept in settings.database_url
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+SYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:// -> sqlite+aiosqlite://, postgresql:// -> postgresql+asyncpg://"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.drivername in SYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS.get(backend, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def sync_database_url(url: str) -> str:
+    """Inverse of async_database_url, so either form can be configured"""
+    parsed = make_url(url)
+    if parsed.drivername == "postgres":
+        parsed = parsed.set(drivername="postgresql")
+    drivername = SYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
+
+SYNC_DATABASE_URL = sync_database_url(settings.database_url)
+ASYNC_DATABASE_URL = async_database_url(settings.database_url)
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMAs applied to every SQLite connection"""
+    # Needed for ON DELETE CASCADE; SQLite leaves foreign keys off by default
+    pragmas = ["PRAGMA foreign_keys=ON"]
+    if not settings.sqlite_production:
+        return pragmas
+    return pragmas + [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+    ]
+
+
+def _engine_options(url: str, writer: bool = False) -> dict:
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000
+        }
+        if parsed.database in (None, "", ":memory:"):
+            # In-memory databases use a single static connection
+            return options
+    options.update(
+        pool_size=1 if writer else settings.db_pool_size,
+        max_overflow=0 if writer else settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+
+def make_engine(url: str, writer: bool = False):
+    """Sync engine for `url`, with the SQLite profile applied to each connection"""
+    engine = create_engine(url, **_engine_options(url, writer))
+    _install_pragmas(engine)
+    return engine
+
+
+def make_async_engine(url: str, writer: bool = False):
+    engine = create_async_engine(url, **_engine_options(url, writer))
+    _install_pragmas(engine.sync_engine)
+    return engine
+
+
+def _install_pragmas(engine) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def routing_session_class(reader, writer) -> type:
+    """
+    Session class that reads on `reader` and sends flushes and
+    INSERT/UPDATE/DELETE statements (and the rest of their transaction)
+    to `writer`.
+    """
+    class RoutingSession(Session):
+        # Once a transaction has written, it stays on the writer so it
+        # reads its own writes and commits on a single connection
+        _writing = False
+
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self._flushing or isinstance(clause, UpdateBase):
+                self._writing = True
+            return writer if self._writing else reader
+
+    @event.listens_for(RoutingSession, "after_transaction_end")
+    def reset_writer(session, transaction):
+        if transaction.parent is None:
+            session._writing = False
+
+    return RoutingSession
+
+
+USE_DEDICATED_WRITER = (
+    settings.sqlite_dedicated_writer
+    and make_url(SYNC_DATABASE_URL).get_backend_name() == "sqlite"
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = make_engine(SYNC_DATABASE_URL)
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+
+if USE_DEDICATED_WRITER:
+    writer_engine = make_engine(SYNC_DATABASE_URL, writer=True)
+    async_writer_engine = make_async_engine(ASYNC_DATABASE_URL, writer=True)
+    SessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        class_=routing_session_class(engine, writer_engine)
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=routing_session_class(
+            async_engine.sync_engine, async_writer_engine.sync_engine
+        ),
+        autoflush=False,
+        expire_on_commit=False
+    )
+else:
+    writer_engine = engine
+    async_writer_engine = async_engine
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
 Base = declarative_base()
 
 def get_db():
@@ -20,7 +176,48 @@ def get_db():
     finally:
         db.close()
 
-def init_db():
-    from app.models import user, conversation, message, document
-    Base.metadata.create_all(bind=engine)
+async def get_async_db():
+    """Async database dependency for the async routes"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def upgrade_database(bind=None) -> None:
+    """
+    Bring the schema to the latest Alembic revision.
 
+    Databases created by the old create_all() have tables but no
+    alembic_version row; they are stamped at the revision their columns
+    match before upgrading.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    bind = bind if bind is not None else engine
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+
+    with bind.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            # Batch migrations rebuild tables with DROP TABLE, which fails
+            # while other rows reference them and foreign keys are enforced.
+            # The PRAGMA is ignored inside a transaction, so it goes first;
+            # env.py runs foreign_key_check before committing instead.
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+        try:
+            with connection.begin():
+                config.attributes["connection"] = connection
+                inspector = inspect(connection)
+                tables = inspector.get_table_names()
+                if "alembic_version" not in tables and "messages" in tables:
+                    columns = {column["name"] for column in inspector.get_columns("messages")}
+                    command.stamp(config, "0002" if "summary_until_id" in columns else "0001")
+                command.upgrade(config, "head")
+        finally:
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
+
+def init_db():
+    upgrade_database()
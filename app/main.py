@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from app.api.routes import health, conversations, documents
 from app.database import init_db
+from app.services.document_service import pdf_extractor
+from app.services.ingestion_service import ingestion_pool
+from app.services.llm_client import close_llm_client
 
 app = FastAPI(title="BOT GPT API", version="1.0.0")
 
@@ -8,6 +11,13 @@ app = FastAPI(title="BOT GPT API", version="1.0.0")
 @app.on_event("startup")
 def startup_event():
     init_db()
+    ingestion_pool.resume()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_llm_client()
+    ingestion_pool.shutdown()
+    pdf_extractor.shutdown()
 
 app.include_router(health.router, tags=["health"])
 app.include_router(conversations.router, prefix="/conversations", tags=["conversations"])
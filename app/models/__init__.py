@@ -2,5 +2,7 @@
 from app.models.user import User
 from app.models.conversation import Conversation, ConversationMode
 from app.models.message import Message, MessageRole
+from app.models.message_archive import MessageArchive
+from app.models.ingestion_job import IngestionJob, IngestionStatus
 
-__all__ = ["User", "Conversation", "ConversationMode", "Message", "MessageRole"]
\ No newline at end of file
+__all__ = ["User", "Conversation", "ConversationMode", "Message", "MessageRole", "MessageArchive", "IngestionJob", "IngestionStatus"]
\ No newline at end of file
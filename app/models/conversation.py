@@ -1,5 +1,5 @@
 """Conversation model"""
-from sqlalchemy import Column, String, Integer, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, DateTime, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -11,6 +11,12 @@ class ConversationMode(str, enum.Enum):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Keyset-paginated listing per user
+        Index("ix_conversations_user_id_created_at", "user_id", "created_at", "id"),
+        # Finding soft-deleted rows to purge
+        Index("ix_conversations_deleted_at", "deleted_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=True)  # no FK for now
@@ -18,12 +24,25 @@ class Conversation(Base):
     mode = Column(SQLEnum(ConversationMode), default=ConversationMode.OPEN_CHAT)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Maintained per turn (see ConversationService._save_turn); summary rows
+    # are not counted. `python -m app.cli reconcile-counters` repairs drift.
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
     total_tokens = Column(Integer, default=0)
+    last_message_at = Column(DateTime, nullable=True)
     document_id = Column(Integer, nullable=True)
+    # Soft delete: hidden at once, rows purged later in the background
+    deleted_at = Column(DateTime, nullable=True)
+    # Set while the messages live in message_archives (cold storage)
+    archived_at = Column(DateTime, nullable=True)
 
+    # Never loaded implicitly: history is read a page at a time through
+    # MessageRepository, so loading a conversation only reads this row.
+    # Deletes rely on the database's ON DELETE CASCADE.
     messages = relationship(
         "Message",
         back_populates="conversation",
         cascade="all, delete-orphan",
-        order_by="Message.created_at"
+        order_by="Message.created_at",
+        lazy="raise_on_sql",
+        passive_deletes=True
     )
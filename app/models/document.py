@@ -1,11 +1,94 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
+class DocumentText(Base):
+    """
+    Extracted text, stored once per distinct content and shared by every
+    document that extracts to it. `ref_count` is the number of documents
+    pointing here; the row is removed when it drops to zero.
+    """
+    __tablename__ = "document_texts"
+    __table_args__ = (
+        Index("ix_document_texts_sha256", "sha256", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    content = Column(Text, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    # BM25 collection statistics over this text's chunks
+    chunk_count = Column(Integer, default=0, server_default="0", nullable=False)
+    term_count = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DocumentChunk(Base):
+    """
+    A retrieval chunk of a stored text, written once at ingestion.
+    `start_offset`/`end_offset` locate it in DocumentText.content; `content`
+    is that span with whitespace collapsed.
+    """
+    __tablename__ = "document_chunks"
+    __table_args__ = (
+        # All chunks of a text, in order
+        Index("ix_document_chunks_text_id_ordinal", "text_id", "ordinal", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    text_id = Column(
+        Integer,
+        ForeignKey("document_texts.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    ordinal = Column(Integer, nullable=False)
+    start_offset = Column(Integer, nullable=False)
+    end_offset = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False)
+    # Index terms in the chunk (BM25 document length)
+    term_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+class ChunkPosting(Base):
+    """
+    Inverted index of a text's chunks: one row per (term, chunk) with the
+    term's frequency in the chunk. Keyed, and on SQLite clustered, by
+    (text_id, term) so a query term's posting list is one range read.
+    """
+    __tablename__ = "chunk_postings"
+    __table_args__ = (
+        {"sqlite_with_rowid": False},
+    )
+
+    text_id = Column(
+        Integer,
+        ForeignKey("document_texts.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    term = Column(String, primary_key=True)
+    chunk_id = Column(
+        Integer,
+        ForeignKey("document_chunks.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    tf = Column(Integer, nullable=False)
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_sha256", "sha256", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    # SHA-256 of the uploaded bytes; re-uploads of the same file map here
+    sha256 = Column(String(64), nullable=True)
+    text_id = Column(Integer, ForeignKey("document_texts.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Texts can be megabytes; load explicitly (repository get(with_text=True))
+    text = relationship("DocumentText", lazy="raise")
+
+    @property
+    def content(self) -> str:
+        return self.text.content
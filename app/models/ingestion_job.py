@@ -0,0 +1,39 @@
+"""PDF ingestion job model"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, Enum as SQLEnum
+from datetime import datetime
+import enum
+from app.database import Base
+
+class IngestionStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class IngestionJob(Base):
+    """
+    A PDF upload waiting for or going through text extraction. The file
+    sits in `path` until a worker has turned it into a Document.
+    """
+    __tablename__ = "ingestion_jobs"
+    __table_args__ = (
+        # Picking up unfinished jobs on startup
+        Index("ix_ingestion_jobs_status", "status"),
+        # Finding an in-flight job for the same file
+        Index("ix_ingestion_jobs_sha256", "sha256"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    # SHA-256 of the uploaded bytes, computed while the upload streams in
+    sha256 = Column(String(64), nullable=True)
+    status = Column(SQLEnum(IngestionStatus), default=IngestionStatus.QUEUED, nullable=False)
+    pages_total = Column(Integer, nullable=True)
+    pages_done = Column(Integer, default=0, nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped with every page, so a job stuck in RUNNING can be told apart
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
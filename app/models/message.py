@@ -1,5 +1,5 @@
 """Message model"""
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Boolean, Column, String, Integer, Text, DateTime, ForeignKey, Index, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -12,7 +12,20 @@ class MessageRole(str, enum.Enum):
 
 class Message(Base):
     __tablename__ = "messages"
-    
+    __table_args__ = (
+        # Context building, pinned/summary lookups and counts
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+        # Full history in order
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+        # At most one rolling summary row per conversation; save_summary upserts against it
+        Index(
+            "uq_messages_conversation_id_summary", "conversation_id", unique=True,
+            sqlite_where=text("is_summary"), postgresql_where=text("is_summary")
+        ),
+        # Ids are never reused on SQLite, so archived messages restore with theirs
+        {"sqlite_autoincrement": True},
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(
         Integer,
@@ -22,6 +35,12 @@ class Message(Base):
     role = Column(SQLEnum(MessageRole), nullable=False)
     content = Column(Text, nullable=False)
     tokens = Column(Integer, default=0)
+    model = Column(String, nullable=True)
+    routing_reason = Column(String, nullable=True)
+    pinned = Column(Boolean, default=False, nullable=False)
+    # Rolling summary rows (role SYSTEM) fold every message up to summary_until_id
+    is_summary = Column(Boolean, default=False, nullable=False)
+    summary_until_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     conversation = relationship(
@@ -0,0 +1,22 @@
+"""Message archive model"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, LargeBinary
+from datetime import datetime
+from app.database import Base
+
+class MessageArchive(Base):
+    """
+    Cold storage for the messages of an inactive conversation: one row per
+    conversation holding a zlib-compressed JSON array of its messages.
+    """
+    __tablename__ = "message_archives"
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(
+        Integer,
+        ForeignKey("conversations.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True
+    )
+    message_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
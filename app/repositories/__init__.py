@@ -1,5 +1,26 @@
 """Repositories package"""
-from app.repositories.conversation_repository import ConversationRepository
-from app.repositories.message_repository import MessageRepository
+from app.repositories.archive_repository import AsyncArchiveRepository
+from app.repositories.conversation_repository import (
+    AsyncConversationRepository,
+    ConversationRepository,
+)
+from app.repositories.document_repository import AsyncDocumentRepository, DocumentRepository
+from app.repositories.ingestion_job_repository import (
+    AsyncIngestionJobRepository,
+    IngestionJobRepository,
+)
+from app.repositories.message_repository import AsyncMessageRepository, MessageRepository
+from app.repositories.transfer_repository import AsyncTransferRepository
 
-__all__ = ["ConversationRepository", "MessageRepository"]
\ No newline at end of file
+__all__ = [
+    "ConversationRepository",
+    "MessageRepository",
+    "DocumentRepository",
+    "AsyncConversationRepository",
+    "AsyncMessageRepository",
+    "AsyncDocumentRepository",
+    "AsyncArchiveRepository",
+    "IngestionJobRepository",
+    "AsyncIngestionJobRepository",
+    "AsyncTransferRepository",
+]
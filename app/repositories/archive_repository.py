@@ -0,0 +1,143 @@
+"""Message archive repository - Data access layer"""
+import json
+import zlib
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.conversation import Conversation
+from app.models.message import Message, MessageRole
+from app.models.message_archive import MessageArchive
+
+# Message fields kept in an archive blob; restore re-inserts the same ids
+ARCHIVED_FIELDS = (
+    "id", "role", "content", "tokens", "model", "routing_reason",
+    "pinned", "is_summary", "summary_until_id", "created_at",
+)
+
+# Ids per DELETE, well under SQLite's bound-parameter limit
+DELETE_BATCH_SIZE = 500
+
+
+def pack_messages(messages: List[Message]) -> bytes:
+    """zlib-compressed JSON array of the messages, oldest first"""
+    rows = []
+    for message in messages:
+        row = {field: getattr(message, field) for field in ARCHIVED_FIELDS}
+        row["role"] = message.role.value
+        row["created_at"] = message.created_at.isoformat() if message.created_at else None
+        rows.append(row)
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode(), 9)
+
+
+def unpack_messages(payload: bytes) -> List[dict]:
+    rows = json.loads(zlib.decompress(payload))
+    for row in rows:
+        row["role"] = MessageRole(row["role"])
+        if row["created_at"]:
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return rows
+
+
+class AsyncArchiveRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def find_inactive(self, idle_since: datetime, limit: int) -> List[int]:
+        """Live, unarchived conversations with no message since `idle_since`"""
+        result = await self.db.execute(
+            select(Conversation.id)
+            .where(
+                Conversation.archived_at.is_(None),
+                Conversation.deleted_at.is_(None),
+                func.coalesce(Conversation.last_message_at, Conversation.created_at) < idle_since
+            )
+            .order_by(Conversation.id)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def archive(self, conversation_id: int, idle_since: datetime) -> Optional[int]:
+        """
+        Move a conversation's messages into a single compressed archive row
+        in one transaction. Only the rows that were packed are deleted, and
+        the conversation is marked archived only if it is still unarchived
+        and idle with no message since it was read; otherwise the
+        transaction is rolled back. Returns the number of messages moved,
+        or None if the conversation was skipped.
+        """
+        last_message_at = (await self.db.execute(
+            select(Conversation.last_message_at).where(Conversation.id == conversation_id)
+        )).scalar()
+        result = await self.db.execute(
+            select(Message)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.id)
+        )
+        messages = list(result.scalars().all())
+
+        self.db.add(MessageArchive(
+            conversation_id=conversation_id,
+            message_count=len(messages),
+            payload=pack_messages(messages)
+        ))
+        ids = [message.id for message in messages]
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            await self.db.execute(
+                delete(Message)
+                .where(Message.id.in_(ids[start:start + DELETE_BATCH_SIZE]))
+                .execution_options(synchronize_session=False)
+            )
+        result = await self.db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.archived_at.is_(None),
+                Conversation.deleted_at.is_(None),
+                Conversation.last_message_at.is_not_distinct_from(last_message_at),
+                func.coalesce(Conversation.last_message_at, Conversation.created_at) < idle_since
+            )
+            .values(archived_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # Written to, deleted or archived since it was selected
+            await self.db.rollback()
+            return None
+        await self.db.commit()
+        return len(messages)
+
+    async def restore(self, conversation_id: int) -> int:
+        """
+        Move an archived conversation's messages back into `messages` with
+        their original ids, so ids held by clients stay valid. The archive
+        row is claimed by deleting it first; when several requests open the
+        same conversation at once only the one that claims it re-inserts
+        the rows, the others find nothing to restore. Returns the number of
+        messages restored.
+        """
+        payload = (await self.db.execute(
+            delete(MessageArchive)
+            .where(MessageArchive.conversation_id == conversation_id)
+            .returning(MessageArchive.payload)
+            .execution_options(synchronize_session=False)
+        )).scalar()
+        if payload is None:
+            await self.db.commit()
+            return 0
+
+        rows = unpack_messages(payload)
+        if rows:
+            await self.db.execute(
+                insert(Message),
+                [{**row, "conversation_id": conversation_id} for row in rows]
+            )
+        await self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(archived_at=None)
+        )
+        await self.db.commit()
+        return len(rows)
@@ -1,10 +1,33 @@
 """Conversation repository - Data access layer"""
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from datetime import datetime
+from sqlalchemy import delete, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from typing import Optional, List, Tuple
 from app.models.conversation import Conversation, ConversationMode
 from app.models.message import Message
 
 
+def _actual_counters() -> dict:
+    """Correlated subqueries giving each conversation's counters from messages"""
+    def over_messages(aggregate):
+        return (
+            select(aggregate)
+            .where(
+                Message.conversation_id == Conversation.id,
+                Message.is_summary.is_(False)
+            )
+            .correlate(Conversation)
+            .scalar_subquery()
+        )
+
+    return {
+        "message_count": over_messages(func.count(Message.id)),
+        "total_tokens": over_messages(func.coalesce(func.sum(Message.tokens), 0)),
+        "last_message_at": over_messages(func.max(Message.created_at)),
+    }
+
+
 class ConversationRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -30,24 +53,221 @@ class ConversationRepository:
     def get(self, conversation_id: int) -> Optional[Conversation]:
         return (
             self.db.query(Conversation)
-            .filter(Conversation.id == conversation_id)
+            .filter(Conversation.id == conversation_id, Conversation.deleted_at.is_(None))
             .first()
         )
     
     def get_by_user(self, user_id: int) -> List[Conversation]:
         return (
             self.db.query(Conversation)
-            .filter(Conversation.user_id == user_id)
+            .filter(Conversation.user_id == user_id, Conversation.deleted_at.is_(None))
             .order_by(Conversation.created_at.desc())
             .all()
         )
     
+    def reconcile_counters(self, conversation_id: Optional[int] = None) -> int:
+        """
+        Recompute the denormalized counters from messages for rows that
+        drifted (all conversations, or just one). Returns the rows fixed.
+        Archived conversations keep their counters while their messages
+        live in message_archives, so they are skipped.
+        """
+        actual = _actual_counters()
+        query = update(Conversation).where(Conversation.archived_at.is_(None), or_(
+            Conversation.message_count != actual["message_count"],
+            Conversation.total_tokens.is_distinct_from(actual["total_tokens"]),
+            Conversation.last_message_at.is_distinct_from(actual["last_message_at"])
+        ))
+        if conversation_id is not None:
+            query = query.where(Conversation.id == conversation_id)
+
+        result = self.db.execute(
+            query.values(**actual).execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+
     def delete(self, conversation_id: int) -> bool:
-        """Delete a conversation and its messages (cascade)"""
-        conversation = self.get(conversation_id)
-        if not conversation:
-            return False
-        
-        self.db.delete(conversation)
+        """Delete a conversation; the database cascades to its messages"""
+        result = self.db.execute(
+            delete(Conversation).where(Conversation.id == conversation_id)
+        )
         self.db.commit()
-        return True
+        return result.rowcount > 0
+
+
+class AsyncConversationRepository:
+    """Async counterpart of ConversationRepository"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(
+        self,
+        user_id: int,
+        title: str = None,
+        mode: ConversationMode = ConversationMode.OPEN_CHAT,
+        document_id: int = None
+    ) -> Conversation:
+        conversation = await self.add(user_id, title, mode, document_id)
+        await self.db.commit()
+        return conversation
+
+    async def add(
+        self,
+        user_id: int,
+        title: str = None,
+        mode: ConversationMode = ConversationMode.OPEN_CHAT,
+        document_id: int = None
+    ) -> Conversation:
+        """Stage a new conversation and get its id, without committing"""
+        conversation = Conversation(
+            user_id=user_id,
+            title=title,
+            mode=mode,
+            document_id=document_id
+        )
+        self.db.add(conversation)
+        await self.db.flush()
+        return conversation
+
+    async def get(self, conversation_id: int) -> Optional[Conversation]:
+        result = await self.db.execute(
+            select(Conversation).where(
+                Conversation.id == conversation_id,
+                Conversation.deleted_at.is_(None)
+            )
+        )
+        return result.scalars().first()
+
+    async def get_by_user(self, user_id: int) -> List[Conversation]:
+        result = await self.db.execute(
+            select(Conversation)
+            .where(Conversation.user_id == user_id, Conversation.deleted_at.is_(None))
+            .order_by(Conversation.created_at.desc())
+        )
+        return list(result.scalars().all())
+
+    async def list_page(
+        self,
+        user_id: int,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        mode: Optional[ConversationMode] = None,
+        document_id: Optional[int] = None
+    ) -> List[Conversation]:
+        """
+        One page of a user's conversations, newest first.
+
+        Keyset-paginated on (created_at, id): `after` is the key of the last
+        row of the previous page.
+        """
+        query = select(Conversation).where(
+            Conversation.user_id == user_id,
+            Conversation.deleted_at.is_(None)
+        )
+        if mode is not None:
+            query = query.where(Conversation.mode == mode)
+        if document_id is not None:
+            query = query.where(Conversation.document_id == document_id)
+        if after is not None:
+            query = query.where(tuple_(Conversation.created_at, Conversation.id) < after)
+
+        result = await self.db.execute(
+            query.order_by(Conversation.created_at.desc(), Conversation.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def record_turn(self, conversation_id: int, messages: List[Message]) -> None:
+        """Add a turn's messages to the conversation counters, without committing"""
+        await self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                message_count=Conversation.message_count + len(messages),
+                total_tokens=func.coalesce(Conversation.total_tokens, 0)
+                + sum(message.tokens or 0 for message in messages),
+                last_message_at=max(message.created_at for message in messages),
+                updated_at=datetime.utcnow()
+            )
+        )
+
+    async def delete(self, conversation_id: int) -> bool:
+        """Delete a conversation; the database cascades to its messages"""
+        result = await self.db.execute(
+            delete(Conversation).where(Conversation.id == conversation_id)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+
+    async def soft_delete(
+        self,
+        conversation_ids: List[int],
+        user_id: Optional[int] = None
+    ) -> List[int]:
+        """Hide conversations at once; returns the ids actually marked"""
+        query = update(Conversation).where(
+            Conversation.id.in_(conversation_ids),
+            Conversation.deleted_at.is_(None)
+        )
+        if user_id is not None:
+            query = query.where(Conversation.user_id == user_id)
+
+        result = await self.db.execute(
+            query.values(deleted_at=datetime.utcnow())
+            .returning(Conversation.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = list(result.scalars().all())
+        await self.db.commit()
+        return deleted
+
+    async def purge_batch(self, batch_size: int) -> int:
+        """
+        Permanently remove up to `batch_size` rows belonging to soft-deleted
+        conversations, in one short transaction. Messages go first in
+        batches; a conversation row is dropped once it has none left, so no
+        single cascade can touch an unbounded number of rows. Returns the
+        number of rows removed (0 when nothing is left to purge).
+        """
+        deleted_ids = (
+            select(Conversation.id)
+            .where(Conversation.deleted_at.is_not(None))
+            .scalar_subquery()
+        )
+        # Aliased so the subqueries don't correlate to the DELETE's own table
+        batch = aliased(Message)
+        message_ids = (
+            select(batch.id)
+            .where(batch.conversation_id.in_(deleted_ids))
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            delete(Message).where(Message.id.in_(message_ids))
+            .execution_options(synchronize_session=False)
+        )
+        removed = result.rowcount
+
+        if removed < batch_size:
+            candidate = aliased(Conversation)
+            empty = (
+                select(candidate.id)
+                .where(
+                    candidate.deleted_at.is_not(None),
+                    ~select(Message.id)
+                    .where(Message.conversation_id == candidate.id)
+                    .exists()
+                )
+                .limit(batch_size - removed)
+                .scalar_subquery()
+            )
+            result = await self.db.execute(
+                delete(Conversation).where(Conversation.id.in_(empty))
+                .execution_options(synchronize_session=False)
+            )
+            removed += result.rowcount
+
+        await self.db.commit()
+        return removed
@@ -1,22 +1,256 @@
-from sqlalchemy.orm import Session
-from typing import Optional
-from app.models.document import Document
+import hashlib
+from datetime import datetime
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import Counter, Dict, List, Optional, Sequence, Tuple
+from app.models.document import ChunkPosting, Document, DocumentChunk, DocumentText
+from app.models.ingestion_job import IngestionJob
+from app.utils.bm25 import term_frequencies
+from app.utils.token_counter import count_tokens
+
+
+def chunk_values(text_id: int, spans: List[Tuple[int, int, str]]) -> List[Dict]:
+    """document_chunks rows for (start, end, chunk) spans of a stored text"""
+    # Counted once at ingestion so retrieval never re-tokenizes
+    return [
+        {
+            "text_id": text_id,
+            "ordinal": ordinal,
+            "start_offset": start,
+            "end_offset": end,
+            "content": chunk,
+            "tokens": count_tokens(chunk)
+        }
+        for ordinal, (start, end, chunk) in enumerate(spans)
+    ]
+
+
+def posting_values(
+    text_id: int,
+    chunk_ids: Sequence[int],
+    frequencies: Sequence[Counter]
+) -> List[Dict]:
+    """chunk_postings rows for chunks and their term frequencies"""
+    return [
+        {"text_id": text_id, "term": term, "chunk_id": chunk_id, "tf": tf}
+        for chunk_id, counts in zip(chunk_ids, frequencies)
+        for term, tf in counts.items()
+    ]
+
+
+def _acquire_text(dialect: str, content: str):
+    """
+    Insert the text, or add a reference to the identical text already
+    stored, in one statement; returns the DocumentText id.
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return (
+        insert(DocumentText)
+        .values(
+            sha256=hashlib.sha256(content.encode()).hexdigest(),
+            content=content,
+            ref_count=1,
+            created_at=datetime.utcnow()
+        )
+        .on_conflict_do_update(
+            index_elements=[DocumentText.sha256],
+            set_={"ref_count": DocumentText.ref_count + 1}
+        )
+        .returning(DocumentText.id)
+    )
+
+
+def _release_text(text_id: int):
+    """Drop one reference; the text goes once nothing points at it"""
+    return (
+        update(DocumentText)
+        .where(DocumentText.id == text_id)
+        .values(ref_count=DocumentText.ref_count - 1)
+        .execution_options(synchronize_session=False),
+        delete(DocumentText)
+        .where(DocumentText.id == text_id, DocumentText.ref_count <= 0)
+        .execution_options(synchronize_session=False),
+    )
+
 
 class DocumentRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create(self, filename: str, content: str) -> Document:
+    def create(self, filename: str, content: str, sha256: Optional[str] = None) -> Document:
+        document = self.add(filename=filename, content=content, sha256=sha256)
+        self.db.commit()
+        return document
+
+    def add(self, filename: str, content: str, sha256: Optional[str] = None) -> Document:
+        """Stage a new document sharing any identical stored text, without committing"""
+        text_id = self.db.execute(
+            _acquire_text(self.db.get_bind().dialect.name, content)
+        ).scalar_one()
         document = Document(
             filename=filename,
-            content=content
+            sha256=sha256,
+            text_id=text_id
         )
         self.db.add(document)
-        self.db.commit()
-        self.db.refresh(document)
+        self.db.flush()
         return document
 
-    def get(self, document_id: int) -> Optional[Document]:
+    def has_chunks(self, text_id: int) -> bool:
+        return self.db.scalar(
+            select(DocumentChunk.id).where(DocumentChunk.text_id == text_id).limit(1)
+        ) is not None
+
+    def add_chunks(self, text_id: int, spans: List[Tuple[int, int, str]]) -> None:
+        """
+        Insert a text's chunks and their inverted index (postings and BM25
+        statistics), without committing. Each table takes one executemany.
+        """
+        rows = chunk_values(text_id, spans)
+        if not rows:
+            return
+        frequencies = [term_frequencies(row["content"]) for row in rows]
+        for row, counts in zip(rows, frequencies):
+            row["term_count"] = sum(counts.values())
+        self.db.execute(insert(DocumentChunk), rows)
+
+        chunk_ids = self.db.scalars(
+            select(DocumentChunk.id)
+            .where(DocumentChunk.text_id == text_id)
+            .order_by(DocumentChunk.ordinal)
+        ).all()
+        postings = posting_values(text_id, chunk_ids, frequencies)
+        if postings:
+            self.db.execute(insert(ChunkPosting), postings)
+        self.db.execute(
+            update(DocumentText)
+            .where(DocumentText.id == text_id)
+            .values(
+                chunk_count=len(rows),
+                term_count=sum(row["term_count"] for row in rows)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def get(self, document_id: int, with_text: bool = False) -> Optional[Document]:
+        """The document; its extracted text is only fetched if `with_text`"""
+        query = self.db.query(Document).filter(Document.id == document_id)
+        if with_text:
+            query = query.options(joinedload(Document.text))
+        return query.first()
+
+    def get_by_sha256(self, sha256: str) -> Optional[Document]:
         return self.db.query(Document).filter(
-            Document.id == document_id
+            Document.sha256 == sha256
         ).first()
+
+
+class AsyncDocumentRepository:
+    """Async counterpart of DocumentRepository"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, filename: str, content: str, sha256: Optional[str] = None) -> Document:
+        text_id = (await self.db.execute(
+            _acquire_text(self.db.get_bind().dialect.name, content)
+        )).scalar_one()
+        document = Document(
+            filename=filename,
+            sha256=sha256,
+            text_id=text_id
+        )
+        self.db.add(document)
+        await self.db.commit()
+        await self.db.refresh(document)
+        return document
+
+    async def get(self, document_id: int, with_text: bool = False) -> Optional[Document]:
+        """The document; its extracted text is only fetched if `with_text`"""
+        query = select(Document).where(Document.id == document_id)
+        if with_text:
+            query = query.options(joinedload(Document.text))
+        result = await self.db.execute(query)
+        return result.scalars().first()
+
+    async def get_by_sha256(self, sha256: str) -> Optional[Document]:
+        result = await self.db.execute(
+            select(Document).where(Document.sha256 == sha256)
+        )
+        return result.scalars().first()
+
+    async def get_index_stats(self, document_id: int) -> Optional[Tuple[int, int, int]]:
+        """(text_id, chunk_count, term_count) of a document's index, or None"""
+        result = await self.db.execute(
+            select(DocumentText.id, DocumentText.chunk_count, DocumentText.term_count)
+            .join(Document, Document.text_id == DocumentText.id)
+            .where(Document.id == document_id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
+
+    async def get_postings(
+        self,
+        text_id: int,
+        terms: Sequence[str]
+    ) -> Dict[str, List[Tuple[int, int, int]]]:
+        """
+        Posting lists of `terms` in a text's index, as term -> [(chunk_id,
+        tf, chunk term_count)]. Reads only the postings of these terms.
+        """
+        postings: Dict[str, List[Tuple[int, int, int]]] = {}
+        if not terms:
+            return postings
+        result = await self.db.execute(
+            select(ChunkPosting.term, ChunkPosting.chunk_id, ChunkPosting.tf, DocumentChunk.term_count)
+            .join(DocumentChunk, DocumentChunk.id == ChunkPosting.chunk_id)
+            .where(ChunkPosting.text_id == text_id, ChunkPosting.term.in_(terms))
+        )
+        for term, chunk_id, tf, length in result.all():
+            postings.setdefault(term, []).append((chunk_id, tf, length))
+        return postings
+
+    async def get_chunks(
+        self,
+        text_id: int,
+        chunk_ids: Optional[Sequence[int]] = None,
+        limit: Optional[int] = None
+    ) -> List[DocumentChunk]:
+        """A text's chunks (all, or just `chunk_ids`) in document order"""
+        query = (
+            select(DocumentChunk)
+            .where(DocumentChunk.text_id == text_id)
+            .order_by(DocumentChunk.ordinal)
+            .limit(limit)
+        )
+        if chunk_ids is not None:
+            query = query.where(DocumentChunk.id.in_(chunk_ids))
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+
+    async def delete(self, document_id: int) -> bool:
+        """Delete a document and release its text, in one transaction"""
+        result = await self.db.execute(
+            select(Document.text_id).where(Document.id == document_id)
+        )
+        text_id = result.scalar()
+        if text_id is None:
+            return False
+
+        await self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.document_id == document_id)
+            .values(document_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            delete(Document)
+            .where(Document.id == document_id)
+            .execution_options(synchronize_session=False)
+        )
+        for statement in _release_text(text_id):
+            await self.db.execute(statement)
+        await self.db.commit()
+        return True
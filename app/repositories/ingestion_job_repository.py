@@ -0,0 +1,127 @@
+"""Ingestion job repository - Data access layer"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.ingestion_job import IngestionJob, IngestionStatus
+
+
+class IngestionJobRepository:
+    """Used by the ingestion workers, which run outside the event loop"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, job_id: int) -> Optional[IngestionJob]:
+        return self.db.get(IngestionJob, job_id)
+
+    def claim(self, job_id: int) -> bool:
+        """Move a queued job to RUNNING; False if another worker got it first"""
+        result = self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.status == IngestionStatus.QUEUED)
+            .values(status=IngestionStatus.RUNNING, pages_done=0, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def set_progress(self, job_id: int, pages_done: int, pages_total: int) -> None:
+        self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(pages_done=pages_done, pages_total=pages_total, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def heartbeat(self, job_ids: List[int]) -> None:
+        """Mark running jobs as alive, even while a long page is extracted"""
+        self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id.in_(job_ids), IngestionJob.status == IngestionStatus.RUNNING)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def finish(
+        self,
+        job_id: int,
+        document_id: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Mark the job done; commits whatever else the session has staged"""
+        now = datetime.utcnow()
+        self.db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(
+                status=IngestionStatus.FAILED if error else IngestionStatus.SUCCEEDED,
+                document_id=document_id,
+                error=error,
+                updated_at=now,
+                finished_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+    def requeue_unfinished(self, stale_before: datetime) -> List[int]:
+        """
+        Put RUNNING jobs that made no progress or heartbeat since
+        `stale_before` (their worker died) back in the queue, and return
+        every queued job id.
+        """
+        self.db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.status == IngestionStatus.RUNNING,
+                IngestionJob.updated_at < stale_before
+            )
+            .values(status=IngestionStatus.QUEUED)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return list(self.db.scalars(
+            select(IngestionJob.id)
+            .where(IngestionJob.status == IngestionStatus.QUEUED)
+            .order_by(IngestionJob.id)
+        ))
+
+
+class AsyncIngestionJobRepository:
+    """Async counterpart used by the API"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, filename: str, path: str, sha256: Optional[str] = None) -> IngestionJob:
+        job = IngestionJob(filename=filename, path=path, sha256=sha256, status=IngestionStatus.QUEUED)
+        self.db.add(job)
+        await self.db.commit()
+        return job
+
+    async def get(self, job_id: int) -> Optional[IngestionJob]:
+        result = await self.db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def get_active_by_sha256(self, sha256: str) -> Optional[IngestionJob]:
+        """A queued or running job for the same upload, if any"""
+        result = await self.db.execute(
+            select(IngestionJob)
+            .where(
+                IngestionJob.sha256 == sha256,
+                IngestionJob.status.in_([IngestionStatus.QUEUED, IngestionStatus.RUNNING])
+            )
+            .order_by(IngestionJob.id)
+            .limit(1)
+        )
+        return result.scalars().first()
@@ -1,39 +1,265 @@
 """Message repository - Data access layer"""
+from sqlalchemy import func, insert, or_, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from app.models.message import Message, MessageRole
+from app.utils.token_counter import count_tokens
+
+# Columns needed to put a message into an LLM prompt
+CONTEXT_COLUMNS = (Message.id, Message.role, Message.content, Message.tokens)
+
+
+def _message_values(
+    conversation_id: int,
+    role: MessageRole,
+    content: str,
+    tokens: Optional[int] = None,
+    model: Optional[str] = None,
+    routing_reason: Optional[str] = None
+) -> Dict:
+    # Counted once at write time so history is never re-tokenized
+    if tokens is None:
+        tokens = count_tokens(content)
+
+    return {
+        "conversation_id": conversation_id,
+        "role": role,
+        "content": content,
+        "tokens": tokens,
+        "model": model,
+        "routing_reason": routing_reason
+    }
+
+
+def _new_message(
+    conversation_id: int,
+    role: MessageRole,
+    content: str,
+    tokens: Optional[int],
+    model: Optional[str],
+    routing_reason: Optional[str]
+) -> Message:
+    return Message(**_message_values(
+        conversation_id, role, content, tokens, model, routing_reason
+    ))
+
 
 class MessageRepository:
     def __init__(self, db: Session):
         self.db = db
-    
+
     def create(
         self,
         conversation_id: int,
         role: MessageRole,
         content: str,
-        tokens: int = 0
+        tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        routing_reason: Optional[str] = None
     ) -> Message:
-        message = Message(
-            conversation_id=conversation_id,
-            role=role,
-            content=content,
-            tokens=tokens
+        message = _new_message(
+            conversation_id, role, content, tokens, model, routing_reason
         )
         self.db.add(message)
         self.db.commit()
         self.db.refresh(message)
         return message
 
-    
+
     def get_by_conversation(self, conversation_id: int) -> List[Message]:
         """Get all messages for a conversation"""
         return self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at).all()
-    
+            Message.conversation_id == conversation_id,
+            Message.is_summary.is_(False)
+        ).order_by(Message.created_at, Message.id).all()
+
     def count_by_conversation(self, conversation_id: int) -> int:
         """Count messages in a conversation"""
         return self.db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).count()
\ No newline at end of file
+            Message.conversation_id == conversation_id,
+            Message.is_summary.is_(False)
+        ).count()
+
+
+class AsyncMessageRepository:
+    """Async counterpart of MessageRepository"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(
+        self,
+        conversation_id: int,
+        role: MessageRole,
+        content: str,
+        tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        routing_reason: Optional[str] = None
+    ) -> Message:
+        message = _new_message(
+            conversation_id, role, content, tokens, model, routing_reason
+        )
+        self.db.add(message)
+        await self.db.commit()
+        await self.db.refresh(message)
+        return message
+
+    async def add_many(self, conversation_id: int, messages: List[Dict]) -> List[Message]:
+        """
+        Insert several messages in one statement without committing.
+
+        Each dict takes the keyword arguments of `create`. Ids come back
+        through INSERT ... RETURNING, so nothing is re-read afterwards;
+        the caller commits as part of its unit of work.
+        """
+        result = await self.db.scalars(
+            insert(Message).returning(Message, sort_by_parameter_order=True),
+            [_message_values(conversation_id, **message) for message in messages]
+        )
+        return list(result.all())
+
+    async def get(self, conversation_id: int, message_id: int) -> Optional[Message]:
+        result = await self.db.execute(
+            select(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.id == message_id
+            )
+        )
+        return result.scalars().first()
+
+    async def get_by_conversation(self, conversation_id: int) -> List[Message]:
+        """Get all messages for a conversation"""
+        result = await self.db.execute(
+            select(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.is_summary.is_(False)
+            ).order_by(Message.created_at, Message.id)
+        )
+        return list(result.scalars().all())
+
+    async def get_page(
+        self,
+        conversation_id: int,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[Message]:
+        """
+        Up to `limit` messages newest first, keyset-paginated on
+        (created_at, id): `before` is the key of the last message of the
+        previous page.
+        """
+        query = select(Message).where(
+            Message.conversation_id == conversation_id,
+            Message.is_summary.is_(False)
+        )
+        if before is not None:
+            query = query.where(tuple_(Message.created_at, Message.id) < before)
+        result = await self.db.execute(
+            query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def count_by_conversation(self, conversation_id: int) -> int:
+        """Count messages in a conversation"""
+        result = await self.db.execute(
+            select(func.count(Message.id)).where(
+                Message.conversation_id == conversation_id,
+                Message.is_summary.is_(False)
+            )
+        )
+        return result.scalar_one()
+
+    async def set_pinned(self, message: Message, pinned: bool) -> Message:
+        message.pinned = pinned
+        await self.db.commit()
+        return message
+
+    async def get_pinned(self, conversation_id: int) -> List:
+        """System and pinned messages, oldest first (context columns only)"""
+        result = await self.db.execute(
+            select(*CONTEXT_COLUMNS).where(
+                Message.conversation_id == conversation_id,
+                Message.is_summary.is_(False),
+                or_(Message.pinned.is_(True), Message.role == MessageRole.SYSTEM)
+            ).order_by(Message.id)
+        )
+        return list(result.all())
+
+    async def iter_recent(
+        self,
+        conversation_id: int,
+        batch_size: int = 50,
+        after_id: Optional[int] = None
+    ) -> AsyncIterator:
+        """
+        Unpinned, non-system messages newest first (optionally only those
+        newer than `after_id`), fetched in keyset batches so callers that
+        stop early never load older rows.
+        """
+        before_id = None
+        while True:
+            query = select(*CONTEXT_COLUMNS).where(
+                Message.conversation_id == conversation_id,
+                Message.pinned.is_(False),
+                Message.role != MessageRole.SYSTEM
+            )
+            if after_id is not None:
+                query = query.where(Message.id > after_id)
+            if before_id is not None:
+                query = query.where(Message.id < before_id)
+            result = await self.db.execute(
+                query.order_by(Message.id.desc()).limit(batch_size)
+            )
+            rows = result.all()
+
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            before_id = rows[-1].id
+
+    async def get_summary(self, conversation_id: int) -> Optional[Message]:
+        """The conversation's rolling summary row, if any"""
+        result = await self.db.execute(
+            select(Message).where(
+                Message.conversation_id == conversation_id,
+                Message.is_summary.is_(True)
+            )
+        )
+        return result.scalars().first()
+
+    async def save_summary(
+        self,
+        conversation_id: int,
+        content: str,
+        until_id: int
+    ) -> Message:
+        """
+        Create or update the single summary row in place, in one upsert
+        against the partial unique index on summary rows, so concurrent
+        summarizers of a conversation cannot add a second one.
+        """
+        upsert = postgresql.insert if self.db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        tokens = count_tokens(content)
+        summary_id = (await self.db.execute(
+            upsert(Message)
+            .values(
+                conversation_id=conversation_id,
+                role=MessageRole.SYSTEM,
+                content=content,
+                tokens=tokens,
+                is_summary=True,
+                summary_until_id=until_id
+            )
+            .on_conflict_do_update(
+                index_elements=[Message.conversation_id],
+                index_where=text("is_summary"),
+                set_={"content": content, "tokens": tokens, "summary_until_id": until_id}
+            )
+            .returning(Message.id)
+        )).scalar_one()
+        await self.db.commit()
+        return await self.db.get(Message, summary_id, populate_existing=True)
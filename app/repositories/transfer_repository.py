@@ -0,0 +1,94 @@
+"""Export/import repository - Data access layer"""
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_archive import MessageArchive
+from app.repositories.archive_repository import ARCHIVED_FIELDS, unpack_messages
+
+CONVERSATION_FIELDS = (
+    "id", "user_id", "title", "mode", "document_id", "created_at", "updated_at",
+    "message_count", "total_tokens", "last_message_at",
+)
+MESSAGE_FIELDS = ARCHIVED_FIELDS
+
+
+class AsyncTransferRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def stream_export(
+        self,
+        batch_size: int,
+        user_id: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Yield ("conversation", row) followed by its ("message", row)s, oldest
+        first, for every live conversation. One query walks conversations
+        and their messages in (conversation id, message id) order through a
+        server-side cursor, fetching `batch_size` rows per round trip, so
+        memory does not grow with the size of the export. Archived
+        conversations are read from their blob.
+        """
+        query = (
+            select(
+                *(getattr(Conversation, f).label(f"c_{f}") for f in CONVERSATION_FIELDS),
+                *(getattr(Message, f).label(f"m_{f}") for f in MESSAGE_FIELDS),
+                MessageArchive.payload
+            )
+            .outerjoin(Message, Message.conversation_id == Conversation.id)
+            .outerjoin(MessageArchive, MessageArchive.conversation_id == Conversation.id)
+            .where(Conversation.deleted_at.is_(None))
+            .order_by(Conversation.id, Message.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if user_id is not None:
+            query = query.where(Conversation.user_id == user_id)
+
+        current = None
+        result = await self.db.stream(query)
+        async for row in result.mappings():
+            if row["c_id"] != current:
+                current = row["c_id"]
+                yield "conversation", {f: row[f"c_{f}"] for f in CONVERSATION_FIELDS}
+                if row["payload"] is not None:
+                    for message in unpack_messages(row["payload"]):
+                        yield "message", {"conversation_id": current, **message}
+            if row["m_id"] is not None:
+                yield "message", {
+                    "conversation_id": current,
+                    **{f: row[f"m_{f}"] for f in MESSAGE_FIELDS}
+                }
+
+    async def add_conversation(self, values: dict) -> int:
+        """Insert one conversation row (no commit) and return its id"""
+        result = await self.db.execute(
+            insert(Conversation).values(**values).returning(Conversation.id)
+        )
+        return result.scalar_one()
+
+    async def add_messages(self, rows: List[dict]) -> None:
+        """Insert message rows with a single executemany (no commit)"""
+        await self.db.execute(insert(Message), rows)
+
+    async def remap_summaries(self, conversation_id: int, positions: List[Tuple[int, int]]) -> None:
+        """
+        Point imported summary rows at the new message ids. `positions` are
+        (summary row, summarized-until row) offsets in insert order, which
+        is also new-id order.
+        """
+        new_ids = (await self.db.execute(
+            select(Message.id)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.id)
+        )).scalars().all()
+        for summary, until in positions:
+            await self.db.execute(
+                update(Message)
+                .where(Message.id == new_ids[summary])
+                .values(summary_until_id=new_ids[until])
+                .execution_options(synchronize_session=False)
+            )
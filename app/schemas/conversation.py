@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -39,6 +39,13 @@ class ConversationListItem(BaseModel):
     message_count: int
 
 
+class ConversationBulkDelete(BaseModel):
+    conversation_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class MessagePin(BaseModel):
+    pinned: bool = True
+
+
 class RAGMessageAdd(BaseModel):
     content: str
-    document_text: str
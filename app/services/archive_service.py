@@ -0,0 +1,42 @@
+"""Cold-storage archiving of inactive conversations"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.repositories.archive_repository import AsyncArchiveRepository
+
+
+class ArchiveService:
+    """
+    Moves the messages of conversations idle for `archive_after_days` into
+    one compressed row each in `message_archives`, keeping the hot
+    `messages` table and its indexes small. ConversationService restores
+    them transparently when such a conversation is opened again.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.archive_repo = AsyncArchiveRepository(db)
+
+    async def archive_inactive(
+        self,
+        days: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> dict:
+        """Archive up to `limit` conversations idle for `days`; one transaction each"""
+        idle_since = datetime.utcnow() - timedelta(
+            days=settings.archive_after_days if days is None else days
+        )
+        conversation_ids = await self.archive_repo.find_inactive(
+            idle_since, limit or settings.archive_batch_size
+        )
+
+        conversations = messages = 0
+        for conversation_id in conversation_ids:
+            moved = await self.archive_repo.archive(conversation_id, idle_since)
+            if moved is not None:
+                conversations += 1
+                messages += moved
+
+        return {"conversations": conversations, "messages": messages}
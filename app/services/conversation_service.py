@@ -1,20 +1,30 @@
-from sqlalchemy.orm import Session
-from typing import Optional, List
-
-from app.repositories.conversation_repository import ConversationRepository
-from app.repositories.message_repository import MessageRepository
+import anyio
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, Optional, List
+
+from app.repositories.archive_repository import AsyncArchiveRepository
+from app.repositories.conversation_repository import AsyncConversationRepository
+from app.repositories.document_repository import AsyncDocumentRepository
+from app.repositories.message_repository import AsyncMessageRepository
+from app.services.llm_router import ModelRouter
 from app.services.llm_service import LLMService
-from app.models.conversation import Conversation
+from app.models.conversation import Conversation, ConversationMode
 from app.models.message import Message
 from app.services.rag_service import RAGService
+from app.utils.context_manager import ContextBuilder
+from app.utils.pagination import decode_cursor, encode_cursor
 from app.models.message import MessageRole
 
 class ConversationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.conversation_repo = ConversationRepository(db)
-        self.message_repo = MessageRepository(db)
+        self.conversation_repo = AsyncConversationRepository(db)
+        self.message_repo = AsyncMessageRepository(db)
+        self.archive_repo = AsyncArchiveRepository(db)
+        self.document_repo = AsyncDocumentRepository(db)
         self.llm_service = LLMService()
+        self.router = ModelRouter()
+        self.context_builder = ContextBuilder(self.message_repo)
         self.rag_service = RAGService()
 
 
@@ -25,145 +35,374 @@ class ConversationService:
         mode,
         document_id: int = None
     ) -> dict:
-        # 1. Create conversation
-        conversation = self.conversation_repo.create(
+        # 1. Call LLM
+        history = [{"role": "user", "content": first_message}]
+        route = self.router.route(history, mode)
+        ai_response = await self.llm_service.generate_response(
+            history, model=route["model"]
+        )
+
+        # 2. Create conversation and save the first turn in one transaction
+        conversation = await self.conversation_repo.add(
             user_id=user_id,
             mode=mode,
             document_id=document_id
         )
-
-        # 2. Save user message
-        self.message_repo.create(
-            conversation_id=conversation.id,
-            role="user",
-            content=first_message
+        await self._save_turn(
+            conversation.id,
+            first_message,
+            ai_response["content"],
+            model=ai_response.get("model", route["model"]),
+            routing_reason=route["reason"]
         )
 
+        return {
+            "conversation_id": conversation.id,
+            "reply": ai_response["content"]
+        }
+    
+    async def add_message(self, conversation_id: int, message: str) -> dict:
+        messages_history, route = await self._start_turn(conversation_id, message)
+
         # 3. Call LLM
         ai_response = await self.llm_service.generate_response(
-            [{"role": "user", "content": first_message}]
+            messages_history, model=route["model"]
         )
 
-        # 4. Save AI message
-        self.message_repo.create(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=ai_response["content"],
-            tokens=ai_response.get("tokens", 0)
+        # 4. Save the user message and AI reply together
+        _, ai_message = await self._save_turn(
+            conversation_id,
+            message,
+            ai_response["content"],
+            model=ai_response.get("model", route["model"]),
+            routing_reason=route["reason"]
         )
 
         return {
-            "conversation_id": conversation.id,
+            "message_id": ai_message.id,
             "reply": ai_response["content"]
         }
-    
-    async def add_message(self, conversation_id: int, message: str) -> dict:
+
+    async def stream_message(
+        self,
+        conversation_id: int,
+        message: str
+    ) -> AsyncIterator[dict]:
+        """
+        Same as add_message, but returns an iterator of reply events.
+
+        The turn is saved once the stream ends or the client goes away.
+        """
+        messages_history, route = await self._start_turn(conversation_id, message)
+        return self._stream_reply(conversation_id, message, messages_history, route)
+
+    async def _open(self, conversation_id: int) -> Optional[Conversation]:
+        """Load a conversation, bringing archived messages back first"""
+        conversation = await self.conversation_repo.get(conversation_id)
+        if conversation is not None and conversation.archived_at is not None:
+            # End the read transaction first: on SQLite it could not be
+            # upgraded to a write once a concurrent restore has committed
+            await self.db.commit()
+            await self.archive_repo.restore(conversation_id)
+        return conversation
+
+    async def _start_turn(self, conversation_id: int, message: str):
         # 1. Check conversation exists
-        conversation = self.conversation_repo.get(conversation_id)
+        conversation = await self._open(conversation_id)
         if not conversation:
             raise ValueError("Conversation not found")
 
-        # 2. Load message history
-        messages = self.message_repo.get_by_conversation(conversation_id)
+        # 2. Load the recent history that fits the token budget,
+        #    ending with the new user message
+        messages_history = await self.context_builder.build(
+            conversation_id, {"role": "user", "content": message}
+        )
 
-        messages_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in messages
-        ]
+        route = self.router.route(messages_history, conversation.mode)
 
-        # 3. Add new user message
-        messages_history.append({"role": "user", "content": message})
+        # Don't hold the read transaction open across the LLM call
+        await self.db.commit()
+        return messages_history, route
 
-        self.message_repo.create(
-            conversation_id=conversation_id,
-            role="user",
-            content=message
-        )
-
-        # 4. Call LLM
-        ai_response = await self.llm_service.generate_response(messages_history)
+    async def _save_turn(
+        self,
+        conversation_id: int,
+        question: str,
+        reply: Optional[str] = None,
+        model: Optional[str] = None,
+        routing_reason: Optional[str] = None
+    ) -> List[Message]:
+        """
+        Persist a turn as one unit of work: the user message, the reply
+        (if any) and the conversation's message_count, total_tokens and
+        last_message_at share a single commit.
+        """
+        messages = [{"role": MessageRole.USER, "content": question}]
+        if reply is not None:
+            messages.append({
+                "role": MessageRole.ASSISTANT,
+                "content": reply,
+                "model": model,
+                "routing_reason": routing_reason
+            })
 
-        # 5. Save AI reply
-        ai_message = self.message_repo.create(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=ai_response["content"],
-            tokens=ai_response.get("tokens", 0)
-        )
+        try:
+            rows = await self.message_repo.add_many(conversation_id, messages)
+            await self.conversation_repo.record_turn(conversation_id, rows)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return rows
 
-        return {
-            "message_id": ai_message.id,
-            "reply": ai_response["content"]
+    async def _stream_reply(
+        self,
+        conversation_id: int,
+        question: str,
+        messages_history: List[Dict],
+        route: dict
+    ) -> AsyncIterator[dict]:
+        """Relay LLM deltas and persist whatever was generated"""
+        parts = []
+        tokens = 0
+        model = route["model"]
+        ai_message = None
+
+        try:
+            async for event in self.llm_service.stream_response(
+                messages_history, model=route["model"]
+            ):
+                if event["event"] == "delta":
+                    parts.append(event["content"])
+                    yield event
+                else:
+                    tokens = event.get("tokens", 0)
+                    model = event.get("model", model)
+        finally:
+            # Runs on completion, on upstream errors and on client disconnect;
+            # shielded so a cancelled response still gets its write
+            with anyio.CancelScope(shield=True):
+                rows = await self._save_turn(
+                    conversation_id,
+                    question,
+                    "".join(parts) if parts else None,
+                    model=model,
+                    routing_reason=route["reason"]
+                )
+            ai_message = rows[1] if parts else None
+
+        yield {
+            "event": "done",
+            "message_id": ai_message.id if ai_message else None,
+            "tokens": ai_message.tokens if ai_message else 0,
+            "usage_tokens": tokens
         }
 
-    def get_conversation(self, conversation_id: int):
-        conversation = self.conversation_repo.get(conversation_id)
+    async def get_conversation(self, conversation_id: int, limit: int = 50):
+        """
+        Conversation metadata plus its latest `limit` messages, oldest
+        first; `next_cursor` pages further back via list_messages.
+        """
+        conversation = await self._open(conversation_id)
         if not conversation:
             return None
 
-        messages = self.message_repo.get_by_conversation(conversation_id)
+        page = await self._message_page(conversation_id, limit)
 
         return {
             "id": conversation.id,
+            "title": conversation.title,
             "mode": conversation.mode,
+            "document_id": conversation.document_id,
             "created_at": conversation.created_at,
-            "messages": [
+            "updated_at": conversation.updated_at,
+            "last_message_at": conversation.last_message_at,
+            "message_count": conversation.message_count,
+            "total_tokens": conversation.total_tokens,
+            "messages": page["items"][::-1],
+            "next_cursor": page["next_cursor"]
+        }
+
+    async def list_messages(
+        self,
+        conversation_id: int,
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Optional[dict]:
+        """A page of messages, newest first, older than the `before` cursor"""
+        if not await self._open(conversation_id):
+            return None
+        return await self._message_page(conversation_id, limit, before)
+
+    async def _message_page(
+        self,
+        conversation_id: int,
+        limit: int,
+        before: Optional[str] = None
+    ) -> dict:
+        after = decode_cursor(before) if before else None
+
+        # One extra row tells us whether there are older messages
+        rows = await self.message_repo.get_page(conversation_id, limit + 1, before=after)
+        page = rows[:limit]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+        return {
+            "items": [
                 {
                     "id": msg.id,
                     "role": msg.role,
                     "content": msg.content,
-                    "created_at": msg.created_at
+                    "created_at": msg.created_at,
+                    "tokens": msg.tokens,
+                    "model": msg.model,
+                    "pinned": msg.pinned
                 }
-                for msg in messages
-            ]
+                for msg in page
+            ],
+            "next_cursor": next_cursor
         }
 
-    def list_conversations(self, user_id: int):
-        conversations = self.conversation_repo.get_by_user(user_id)
-
-        result = []
-        for convo in conversations:
-            message_count = self.message_repo.count_by_conversation(convo.id)
-            result.append({
-                "id": convo.id,
-                "mode": convo.mode,
-                "created_at": convo.created_at,
-                "message_count": message_count
-            })
+    async def pin_message(self, conversation_id: int, message_id: int, pinned: bool):
+        """Pinned messages are always kept in the context window"""
+        if not await self._open(conversation_id):
+            return None
+        message = await self.message_repo.get(conversation_id, message_id)
+        if not message:
+            return None
+        await self.message_repo.set_pinned(message, pinned)
+        return {"id": message.id, "pinned": message.pinned}
+
+    async def list_conversations(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        mode: Optional[ConversationMode] = None,
+        document_id: Optional[int] = None
+    ) -> dict:
+        """A page of conversations plus the cursor for the next page"""
+        after = decode_cursor(cursor) if cursor else None
+
+        # One extra row tells us whether there is a next page
+        rows = await self.conversation_repo.list_page(
+            user_id, limit + 1, after=after, mode=mode, document_id=document_id
+        )
+        page = rows[:limit]
 
-        return result
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+        return {
+            "items": [
+                {
+                    "id": convo.id,
+                    "title": convo.title,
+                    "mode": convo.mode,
+                    "document_id": convo.document_id,
+                    "created_at": convo.created_at,
+                    "updated_at": convo.updated_at,
+                    "last_message_at": convo.last_message_at,
+                    "message_count": convo.message_count,
+                    "total_tokens": convo.total_tokens
+                }
+                for convo in page
+            ],
+            "next_cursor": next_cursor
+        }
 
     async def add_rag_message(
         self,
         conversation_id: int,
-        question: str,
-        document_text: str
+        question: str
+    ):
+        augmented_messages, relevant_chunks, route = await self._start_rag_turn(
+            conversation_id, question
+        )
+
+        # 5. Call LLM
+        response = await self.llm_service.generate_response(
+            augmented_messages, model=route["model"]
+        )
+
+        # 6. Save the question and reply together
+        await self._save_turn(
+            conversation_id,
+            question,
+            response["content"],
+            model=response.get("model", route["model"]),
+            routing_reason=route["reason"]
+        )
+
+        return {
+            "reply": response["content"],
+            "sources": relevant_chunks
+        }
+
+    async def stream_rag_message(
+        self,
+        conversation_id: int,
+        question: str
+    ) -> AsyncIterator[dict]:
+        """Streaming variant of add_rag_message; sources are sent first"""
+        augmented_messages, relevant_chunks, route = await self._start_rag_turn(
+            conversation_id, question
+        )
+
+        async def events():
+            yield {"event": "sources", "sources": relevant_chunks}
+            async for event in self._stream_reply(
+                conversation_id, question, augmented_messages, route
+            ):
+                yield event
+
+        return events()
+
+    async def _start_rag_turn(
+        self,
+        conversation_id: int,
+        question: str
     ):
         # 1. Check conversation exists
-        conversation = self.conversation_repo.get(conversation_id)
+        conversation = await self._open(conversation_id)
         if not conversation:
             raise ValueError("Conversation not found")
 
-        # 2. Chunk document
-        chunks = self.rag_service.chunk_document(document_text)
-
-        # 3. Retrieve relevant chunks
-        relevant_chunks = self.rag_service.retrieve_relevant_chunks(
-            query=question,
-            chunks=chunks,
-            top_k=3
+        # 2. Find the document's index
+        index = None
+        if conversation.document_id is not None:
+            index = await self.document_repo.get_index_stats(conversation.document_id)
+        if not index:
+            raise ValueError("Document not found")
+        text_id, chunk_count, term_count = index
+
+        # 3. Retrieve relevant chunks: BM25 over the question terms' postings
+        postings = await self.document_repo.get_postings(
+            text_id, self.rag_service.query_terms(question)
         )
+        ranked = self.rag_service.rank(postings, chunk_count, term_count, top_k=3)
+        if ranked:
+            by_id = {
+                chunk.id: chunk.content
+                for chunk in await self.document_repo.get_chunks(
+                    text_id, chunk_ids=[chunk_id for chunk_id, _ in ranked]
+                )
+            }
+            relevant_chunks = [by_id[chunk_id] for chunk_id, _ in ranked]
+        else:
+            # Nothing matched: fall back to the start of the document
+            relevant_chunks = [
+                chunk.content for chunk in await self.document_repo.get_chunks(text_id, limit=3)
+            ]
 
         context = "\n\n".join(relevant_chunks)
 
-        # 4. Save user question
-        self.message_repo.create(
-            conversation_id=conversation_id,
-            role=MessageRole.USER,
-            content=question
-        )
-
-        # 5. Build augmented prompt
+        # 4. Build augmented prompt
         augmented_prompt = f"""
     Use the following document context to answer the question.
 
@@ -174,25 +413,18 @@ class ConversationService:
     {question}
     """
 
-        # 6. Call LLM
-        response = await self.llm_service.generate_response([
-            {"role": "user", "content": augmented_prompt}
-        ])
+        augmented_messages = [{"role": "user", "content": augmented_prompt}]
+        route = self.router.route(augmented_messages, ConversationMode.RAG)
 
-        # 7. Save assistant reply
-        self.message_repo.create(
-            conversation_id=conversation_id,
-            role=MessageRole.ASSISTANT,
-            content=response["content"]
-        )
+        await self.db.commit()
+        return augmented_messages, relevant_chunks, route
 
-        return {
-            "reply": response["content"],
-            "sources": relevant_chunks
-        }
+    async def delete_conversation(self, conversation_id: int) -> bool:
+        """Soft-delete a conversation; its rows are purged in the background"""
+        return bool(await self.conversation_repo.soft_delete([conversation_id]))
 
-    def delete_conversation(self, conversation_id: int) -> bool:
-        """Delete a conversation"""
-        return self.conversation_repo.delete(conversation_id)
+    async def delete_conversations(self, conversation_ids: List[int], user_id: int) -> List[int]:
+        """Soft-delete many of a user's conversations at once"""
+        return await self.conversation_repo.soft_delete(conversation_ids, user_id=user_id)
 
 
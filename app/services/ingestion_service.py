@@ -0,0 +1,179 @@
+"""Background PDF ingestion"""
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+import anyio
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repositories.document_repository import AsyncDocumentRepository
+from app.repositories.ingestion_job_repository import (
+    AsyncIngestionJobRepository,
+    IngestionJobRepository,
+)
+from app.services.document_service import DocumentService
+
+
+class IngestionPool:
+    """
+    A fixed number of worker threads running DocumentService.ingest, with
+    at most `max_pending` jobs queued or running per process so a burst of
+    uploads cannot pile up unbounded work. While jobs run, a heartbeat
+    thread keeps their `updated_at` fresh, so another process restarting
+    never takes them for abandoned and requeues them.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._running: Set[int] = set()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def full(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def submit(self, job_id: int) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="ingestion"
+                )
+            if self._heartbeat is None:
+                self._stopped.clear()
+                self._heartbeat = threading.Thread(
+                    target=self._beat, name="ingestion-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+            self._pending += 1
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: int) -> None:
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            with SessionLocal() as db:
+                DocumentService(db).ingest(job_id)
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                self._pending -= 1
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(settings.ingestion_heartbeat_seconds):
+            with self._lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                with SessionLocal() as db:
+                    IngestionJobRepository(db).heartbeat(job_ids)
+            except Exception as e:
+                print(f"Ingestion heartbeat failed: {e}")
+
+    def resume(self) -> int:
+        """Queue jobs left unfinished by a previous run; returns how many"""
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ingestion_stale_seconds)
+        with SessionLocal() as db:
+            job_ids = IngestionJobRepository(db).requeue_unfinished(stale_before)
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def shutdown(self) -> None:
+        """Stop taking jobs; queued ones stay QUEUED and resume on next start"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._heartbeat = None
+        self._stopped.set()
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+ingestion_pool = IngestionPool(settings.ingestion_workers, settings.ingestion_max_pending)
+
+
+class IngestionService:
+    """API side of ingestion: accept uploads as jobs and report on them"""
+
+    def __init__(self, db: AsyncSession, pool: IngestionPool = ingestion_pool):
+        self.document_repo = AsyncDocumentRepository(db)
+        self.job_repo = AsyncIngestionJobRepository(db)
+        self.pool = pool
+
+    async def enqueue(self, file: UploadFile) -> dict:
+        """
+        Stream the upload to `upload_dir` in `upload_chunk_size` pieces,
+        hashing it on the way, and queue a job for it. A file already
+        ingested returns its document (`duplicate: True`) and one already
+        in flight returns that job; neither is extracted again. Raises
+        OverflowError when the pool is at capacity and ValueError when the
+        file exceeds `upload_max_bytes`.
+        """
+        if self.pool.full:
+            raise OverflowError("Ingestion queue is full, try again later")
+
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        path = os.path.join(settings.upload_dir, f"{uuid.uuid4().hex}.pdf")
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            async with await anyio.open_file(path, "wb") as out:
+                while chunk := await file.read(settings.upload_chunk_size):
+                    size += len(chunk)
+                    if size > settings.upload_max_bytes:
+                        raise ValueError(
+                            f"File is larger than {settings.upload_max_bytes} bytes"
+                        )
+                    digest.update(chunk)
+                    await out.write(chunk)
+
+            sha256 = digest.hexdigest()
+            document = await self.document_repo.get_by_sha256(sha256)
+            if document:
+                os.remove(path)
+                return {"document_id": document.id, "filename": document.filename, "duplicate": True}
+            job = await self.job_repo.get_active_by_sha256(sha256)
+            if job:
+                os.remove(path)
+                return self._job_status(job)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        job = await self.job_repo.create(filename=file.filename, path=path, sha256=sha256)
+        self.pool.submit(job.id)
+        return self._job_status(job)
+
+    async def get_job(self, job_id: int) -> Optional[dict]:
+        job = await self.job_repo.get(job_id)
+        return self._job_status(job) if job else None
+
+    @staticmethod
+    def _job_status(job) -> dict:
+        return {
+            "job_id": job.id,
+            "filename": job.filename,
+            "status": job.status.value,
+            "pages_done": job.pages_done or 0,
+            "pages_total": job.pages_total,
+            "document_id": job.document_id,
+            "error": job.error,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at
+        }
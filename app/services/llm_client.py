@@ -0,0 +1,62 @@
+"""Shared async LLM client
+
+One AsyncGroq client per process, backed by a pooled keep-alive httpx
+transport, plus a semaphore bounding the number of in-flight completions.
+"""
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+from groq import AsyncGroq
+
+from app.config import settings
+from app.services.llm_scheduler import get_llm_scheduler
+
+_client: Optional[AsyncGroq] = None
+_limiter: Optional[asyncio.Semaphore] = None
+
+
+def get_llm_client() -> AsyncGroq:
+    """Return the process-wide AsyncGroq client, creating it on first use"""
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry,
+            ),
+            timeout=settings.llm_timeout,
+            event_hooks={"response": [_observe_rate_limits]},
+        )
+        _client = AsyncGroq(
+            api_key=settings.groq_api_key or os.getenv("GROQ_API_KEY"),
+            http_client=http_client,
+            timeout=settings.llm_timeout,
+        )
+    return _client
+
+
+def get_llm_limiter() -> asyncio.Semaphore:
+    """Semaphore capping concurrent upstream LLM requests"""
+    global _limiter
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(settings.llm_max_concurrency)
+    return _limiter
+
+
+async def _observe_rate_limits(response: httpx.Response) -> None:
+    """Feed provider rate-limit headers (and 429s) to the scheduler"""
+    scheduler = get_llm_scheduler()
+    if scheduler is not None:
+        scheduler.update_from_headers(response.status_code, response.headers)
+
+
+async def close_llm_client() -> None:
+    """Close pooled connections (called on application shutdown)"""
+    global _client, _limiter
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _limiter = None
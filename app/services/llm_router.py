@@ -0,0 +1,54 @@
+"""Latency-aware routing of turns across configured models"""
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.models.conversation import ConversationMode
+from app.utils.circuit_breaker import get_circuit_breaker
+from app.utils.latency import get_latency_tracker
+from app.utils.token_counter import count_prompt_tokens
+
+
+class ModelRouter:
+    """
+    Sends easy turns (open chat, short prompt) to whichever eligible model
+    currently has the lowest moving-average latency, and hard turns (RAG
+    or long prompts) to the primary model.
+    """
+
+    def __init__(
+        self,
+        primary_model: Optional[str] = None,
+        fast_models: Optional[List[str]] = None,
+        max_fast_tokens: Optional[int] = None
+    ):
+        self.primary_model = primary_model or settings.llm_model
+        self.fast_models = (
+            fast_models if fast_models is not None else settings.llm_fast_models
+        )
+        self.max_fast_tokens = (
+            max_fast_tokens if max_fast_tokens is not None
+            else settings.llm_router_max_fast_tokens
+        )
+
+    def route(self, messages: List[Dict], mode=ConversationMode.OPEN_CHAT) -> dict:
+        """Return {"model": str, "reason": str} for this turn"""
+        if not settings.llm_router_enabled or not self.fast_models:
+            return {"model": self.primary_model, "reason": "default"}
+
+        if mode == ConversationMode.RAG:
+            return {"model": self.primary_model, "reason": "rag"}
+
+        prompt_tokens = count_prompt_tokens(messages)
+        if prompt_tokens > self.max_fast_tokens:
+            return {"model": self.primary_model, "reason": "long_prompt"}
+
+        candidates = [
+            model for model in self.fast_models + [self.primary_model]
+            if get_circuit_breaker(model).state != "open"
+        ]
+        if not candidates:
+            return {"model": self.primary_model, "reason": "default"}
+
+        # Unmeasured models sort first so each gets explored
+        model = min(candidates, key=lambda m: get_latency_tracker(m).ewma or 0.0)
+        return {"model": model, "reason": "short_prompt"}
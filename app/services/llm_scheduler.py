@@ -0,0 +1,226 @@
+"""Rate-limit-aware admission of LLM requests
+
+Requests wait in a priority queue and are released only when both the
+requests-per-minute and tokens-per-minute buckets have budget. Buckets
+refill continuously and are corrected from the provider's rate-limit
+response headers.
+"""
+import asyncio
+import enum
+import heapq
+import itertools
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+from app.config import settings
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (0 if it can now)"""
+        self.refill(now)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: float, reset_seconds: float, now: float) -> None:
+        """Never believe we have more budget than the server says we do"""
+        self.refill(now)
+        if remaining <= 0:
+            self.level = min(self.level, -reset_seconds * self.rate)
+        else:
+            self.level = min(self.level, remaining)
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    tokens: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> float:
+    """Parse rate-limit reset values such as '2m59.56s', '7.66s' or '120ms'"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(n) * scale[unit] for n, unit in _DURATION_PART.findall(value))
+
+
+class LLMScheduler:
+    def __init__(self, rpm_limit: int, tpm_limit: int):
+        self.requests = TokenBucket(rpm_limit, rpm_limit)
+        self.tokens = TokenBucket(tpm_limit, tpm_limit)
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waits: Dict[str, dict] = {
+            p.name.lower(): {"admitted": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for p in Priority
+        }
+        self.rate_limited = 0
+
+    async def acquire(
+        self,
+        estimated_tokens: int,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> None:
+        """Wait until the request fits in both budgets"""
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(
+            priority=int(priority),
+            seq=next(self._seq),
+            # A request larger than the bucket would otherwise wait forever
+            tokens=min(estimated_tokens, self.tokens.capacity),
+            future=loop.create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queue, ticket)
+        self._dispatch()
+        await ticket.future
+
+    def try_acquire(self, estimated_tokens: int) -> bool:
+        """Admit immediately if nobody is queued and budget allows"""
+        if any(not t.future.done() for t in self._queue):
+            return False
+        now = time.monotonic()
+        tokens = min(estimated_tokens, self.tokens.capacity)
+        if self.requests.time_until(1, now) > 0 or self.tokens.time_until(tokens, now) > 0:
+            return False
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+        return True
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once real usage is known"""
+        estimated_tokens = min(estimated_tokens, self.tokens.capacity)
+        if actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+        else:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def update_from_headers(self, status_code: int, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        if "x-ratelimit-remaining-requests" in headers:
+            self.requests.sync(
+                float(headers["x-ratelimit-remaining-requests"]),
+                parse_duration(headers.get("x-ratelimit-reset-requests")),
+                now,
+            )
+        if "x-ratelimit-remaining-tokens" in headers:
+            self.tokens.sync(
+                float(headers["x-ratelimit-remaining-tokens"]),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                now,
+            )
+        if status_code == 429:
+            self.rate_limited += 1
+            retry_after = parse_duration(headers.get("retry-after")) or 1.0
+            self.requests.sync(0, retry_after, now)
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(1 for t in self._queue if not t.future.done()),
+            "requests_available": round(self.requests.level, 2),
+            "tokens_available": round(self.tokens.level, 2),
+            "rate_limited": self.rate_limited,
+            "queue_wait": {
+                name: {
+                    "admitted": w["admitted"],
+                    "avg_wait": w["total_wait"] / w["admitted"] if w["admitted"] else 0.0,
+                    "max_wait": w["max_wait"],
+                }
+                for name, w in self._waits.items()
+            },
+        }
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._queue:
+            ticket = self._queue[0]
+            if ticket.future.done():
+                # Waiter was cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+
+            wait = max(
+                self.requests.time_until(1, now),
+                self.tokens.time_until(ticket.tokens, now),
+            )
+            if wait > 0:
+                self._schedule(now + wait)
+                return
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(ticket.tokens)
+            self._record_wait(ticket, now)
+            ticket.future.set_result(None)
+
+    def _schedule(self, at: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            if self._timer_at <= at:
+                return
+            self._timer.cancel()
+        self._timer_loop = loop
+        self._timer_at = at
+        self._timer = loop.call_later(max(0.0, at - time.monotonic()), self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _record_wait(self, ticket: _Ticket, now: float) -> None:
+        waited = now - ticket.enqueued_at
+        w = self._waits[Priority(ticket.priority).name.lower()]
+        w["admitted"] += 1
+        w["total_wait"] += waited
+        w["max_wait"] = max(w["max_wait"], waited)
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> Optional[LLMScheduler]:
+    """Process-wide scheduler, or None when scheduling is disabled"""
+    global _scheduler
+    if not settings.llm_scheduler_enabled:
+        return None
+    if _scheduler is None:
+        _scheduler = LLMScheduler(settings.llm_rpm_limit, settings.llm_tpm_limit)
+    return _scheduler
@@ -1,54 +1,317 @@
 # app/services/llm_service.py
-import os
-from groq import Groq
-from typing import List, Dict
-import os
+import asyncio
+import time
+from typing import AsyncIterator, Iterable, List, Dict, Optional
 from dotenv import load_dotenv
-from groq import Groq
+from groq import APIStatusError, AsyncGroq
+
+from app.config import settings
+from app.services.llm_client import get_llm_client, get_llm_limiter
+from app.services.llm_scheduler import Priority, get_llm_scheduler
+from app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.utils.latency import get_latency_tracker
+from app.utils.llm_cache import LLMResponseCache, get_llm_cache, make_cache_key
+from app.utils.single_flight import SingleFlight
+from app.utils.token_counter import count_prompt_tokens
 
 load_dotenv()
 
+# Identical concurrent requests share one upstream call
+in_flight = SingleFlight()
+
+hedge_stats = {"in_flight": 0, "sent": 0, "won": 0}
+
 
 class LLMService:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"  # or "mixtral-8x7b-32768"
-        self.max_tokens = 1024
-    
-    async def generate_response(self, messages: List[Dict[str, str]]) -> dict:
+    def __init__(
+        self,
+        client: Optional[AsyncGroq] = None,
+        cache: Optional[LLMResponseCache] = None
+    ):
+        self._client = client
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.model = settings.llm_model
+        self.max_tokens = settings.llm_max_tokens
+        self.temperature = 0.7
+
+    @property
+    def client(self) -> AsyncGroq:
+        """Injected client, or the shared pooled client"""
+        if self._client is None:
+            self._client = get_llm_client()
+        return self._client
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        use_cache: bool = True,
+        priority: Priority = Priority.INTERACTIVE,
+        model: Optional[str] = None
+    ) -> dict:
         """
         Generate response from LLM
-        
+
         Args:
             messages: List of dicts with 'role' and 'content'
                      [{"role": "user", "content": "Hello"}]
-        
+            use_cache: Set False to bypass the response cache
+            priority: Scheduling class when rate-limit budget is short
+            model: Model chosen by the router (defaults to settings.llm_model)
+
         Returns:
-            dict with 'content' and 'tokens'
+            dict with 'content', 'tokens', 'model' and 'cached'
         """
+        model = model or self.model
+        key = make_cache_key(model, self._params(), messages)
+        use_cache = use_cache and self.cache is not None
+
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        async def complete() -> dict:
+            result = await self._complete(messages, priority, model)
+            # Fallback-model answers are not cached under the requested model's key
+            if use_cache and result["model"] == model:
+                self.cache.set(key, result)
+            return result
+
+        result = await in_flight.do(key, complete)
+        return {**result, "cached": False}
+
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        priority: Priority = Priority.INTERACTIVE,
+        model: Optional[str] = None
+    ) -> dict:
+        """Call the upstream LLM"""
         try:
-            # Add system message
-            full_messages = [
-                {"role": "system", "content": "You are a helpful assistant."}
-            ] + messages
-            
-            # Call Groq API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=full_messages,
-                max_tokens=self.max_tokens,
-                temperature=0.7
-            )
-            
+            full_messages = self._with_system_prompt(messages)
+            scheduler = get_llm_scheduler()
+            estimated = self._estimate_tokens(full_messages)
+            model = self._select_model(model or self.model)
+            try:
+                if scheduler is not None:
+                    await scheduler.acquire(estimated, priority)
+
+                # Call Groq API without blocking the event loop
+                response = await self._hedged(model, full_messages, estimated)
+            except BaseException:
+                # Cancelled or failed before the call recorded an outcome
+                # (e.g. while queued): free the half-open trial slot
+                get_circuit_breaker(model).abandon()
+                raise
+
             # Extract response
             content = response.choices[0].message.content
             tokens = response.usage.total_tokens
-            
+            if scheduler is not None:
+                scheduler.settle(estimated, tokens)
+
             return {
                 "content": content,
-                "tokens": tokens
+                "tokens": tokens,
+                "model": model
             }
-            
+
+        except Exception as e:
+            print(f"LLM API Error: {e}")
+            raise Exception(f"Failed to generate response: {str(e)}")
+
+    async def _hedged(self, model: str, full_messages: List[Dict], estimated: int):
+        """
+        Run the request; if it is still pending after the model's
+        configured latency percentile, race a duplicate against it.
+        """
+        tracker = get_latency_tracker(model)
+        primary = asyncio.ensure_future(self._attempt(model, full_messages))
+        if not settings.llm_hedge_enabled or tracker.count < settings.llm_hedge_min_samples:
+            return await primary
+
+        tasks = {primary}
+        try:
+            delay = tracker.percentile(settings.llm_hedge_percentile)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self._reserve_hedge(estimated):
+                return await primary
+
+            hedge = asyncio.ensure_future(self._attempt(model, full_messages))
+            tasks.add(hedge)
+            winner = None
+            try:
+                winner = await self._first_success(tasks)
+            finally:
+                hedge_stats["in_flight"] -= 1
+                # The caller settles one reservation against the returned
+                # response; settle the hedge's against the attempt that lost
+                self._settle_hedge(estimated, primary if winner is hedge else hedge)
+            if winner is hedge:
+                hedge_stats["won"] += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _first_success(self, tasks: Iterable[asyncio.Task]) -> asyncio.Task:
+        """First task to succeed; raises the last error if all fail"""
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+                error = task.exception()
+        raise error
+
+    def _reserve_hedge(self, estimated: int) -> bool:
+        """Hedges are capped and only sent when rate-limit budget is free"""
+        if hedge_stats["in_flight"] >= settings.llm_hedge_max_in_flight:
+            return False
+        scheduler = get_llm_scheduler()
+        if scheduler is not None and not scheduler.try_acquire(estimated):
+            return False
+        hedge_stats["in_flight"] += 1
+        hedge_stats["sent"] += 1
+        return True
+
+    def _settle_hedge(self, estimated: int, loser: asyncio.Task) -> None:
+        """Refund the hedge reservation except what the losing attempt used"""
+        scheduler = get_llm_scheduler()
+        if scheduler is None:
+            return
+        used = 0
+        if loser.done() and not loser.cancelled() and loser.exception() is None:
+            used = loser.result().usage.total_tokens
+        scheduler.settle(estimated, used)
+
+    async def _attempt(self, model: str, full_messages: List[Dict]):
+        """One upstream call, feeding the breaker and latency stats"""
+        breaker = get_circuit_breaker(model)
+        started = time.monotonic()
+        try:
+            async with get_llm_limiter():
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=full_messages,
+                    **self._params()
+                )
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception as e:
+            self._record_outcome(breaker, e)
+            raise
+
+        breaker.record_success()
+        get_latency_tracker(model).record(time.monotonic() - started)
+        return response
+
+    def _record_outcome(self, breaker, error: Exception) -> None:
+        """Only upstream trouble counts against the circuit, not bad requests"""
+        if isinstance(error, APIStatusError) and error.status_code < 500 and error.status_code != 429:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def _select_model(self, model: str) -> str:
+        """Requested model, or the fallback while its circuit is open"""
+        if get_circuit_breaker(model).allow():
+            return model
+        fallback = settings.llm_fallback_model
+        if fallback and fallback != model and get_circuit_breaker(fallback).allow():
+            return fallback
+        raise CircuitOpenError(f"Circuit open for model {model}")
+
+    async def stream_response(
+        self,
+        messages: List[Dict[str, str]],
+        priority: Priority = Priority.INTERACTIVE,
+        model: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a response from the LLM as it is generated
+
+        Yields {"event": "delta", "content": str} for every content chunk,
+        then a final {"event": "done", "content": str, "tokens": int, "model": str}.
+        """
+        full_messages = self._with_system_prompt(messages)
+        parts = []
+        tokens = 0
+
+        try:
+            scheduler = get_llm_scheduler()
+            estimated = self._estimate_tokens(full_messages)
+            model = self._select_model(model or self.model)
+            breaker = get_circuit_breaker(model)
+            if scheduler is not None:
+                try:
+                    await scheduler.acquire(estimated, priority)
+                except BaseException:
+                    # Cancelled while queued: free the half-open trial slot
+                    breaker.abandon()
+                    raise
+
+            try:
+                async with get_llm_limiter():
+                    stream = await self.client.chat.completions.create(
+                        model=model,
+                        messages=full_messages,
+                        stream=True,
+                        **self._params()
+                    )
+                    async for chunk in stream:
+                        # Groq reports usage on the final chunk
+                        x_groq = getattr(chunk, "x_groq", None)
+                        usage = getattr(x_groq, "usage", None)
+                        if usage is not None:
+                            tokens = usage.total_tokens
+
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            yield {"event": "delta", "content": delta}
+            except Exception as e:
+                self._record_outcome(breaker, e)
+                raise
+            except BaseException:
+                # Client went away mid-stream
+                breaker.abandon()
+                raise
+            breaker.record_success()
+
+            if scheduler is not None:
+                scheduler.settle(estimated, tokens or estimated)
+
         except Exception as e:
             print(f"LLM API Error: {e}")
-            raise Exception(f"Failed to generate response: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to generate response: {str(e)}")
+
+        yield {
+            "event": "done",
+            "content": "".join(parts),
+            "tokens": tokens,
+            "model": model
+        }
+
+    def _params(self) -> dict:
+        """Sampling parameters sent with every completion"""
+        return {"max_tokens": self.max_tokens, "temperature": self.temperature}
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Upper-bound budget for a request: prompt estimate plus max completion"""
+        return count_prompt_tokens(messages) + self.max_tokens
+
+    def _with_system_prompt(
+        self,
+        messages: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """Prepend the assistant system message"""
+        return [
+            {"role": "system", "content": "You are a helpful assistant."}
+        ] + messages
@@ -0,0 +1,50 @@
+"""Background purge of soft-deleted conversations"""
+import asyncio
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.repositories.conversation_repository import AsyncConversationRepository
+
+
+class PurgeService:
+    """
+    Removes the rows of soft-deleted conversations in bounded batches,
+    committing after each one so no transaction holds the write lock for
+    long and other requests can interleave.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None):
+        self.conversation_repo = AsyncConversationRepository(db)
+        self.batch_size = batch_size or settings.purge_batch_size
+
+    async def purge(self) -> int:
+        """Purge until nothing is left; returns the number of rows removed"""
+        total = 0
+        while True:
+            removed = await self.conversation_repo.purge_batch(self.batch_size)
+            total += removed
+            if removed == 0:
+                return total
+            await asyncio.sleep(0)
+
+
+_running = False
+
+
+async def purge_in_background() -> None:
+    """Background task run after a delete; uses its own session"""
+    global _running
+    if _running:
+        return
+
+    _running = True
+    try:
+        async with AsyncSessionLocal() as db:
+            await PurgeService(db).purge()
+    except Exception as e:
+        print(f"Purge of deleted conversations failed: {e}")
+    finally:
+        _running = False
@@ -1,33 +1,44 @@
 """RAG Service for document-based Q&A"""
-from typing import List
+from typing import Dict, List, Tuple
 import re
 
+from app.utils import bm25
+from app.utils.bm25 import term_frequencies, tokenize
+
 class RAGService:
     def __init__(self, chunk_size: int = 500):
         self.chunk_size = chunk_size
     
     def chunk_document(self, text: str) -> List[str]:
         """Split document into chunks"""
-        # Clean text
-        text = re.sub(r'\s+', ' ', text).strip()
-        
+        return [chunk for _, _, chunk in self.chunk_spans(text)]
+
+    def chunk_spans(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Split document into chunks of about `chunk_size` characters, as
+        (start, end, chunk) where text[start:end] is the span the chunk
+        was taken from and chunk is that span with whitespace collapsed.
+        """
         chunks = []
-        words = text.split()
         current_chunk = []
         current_length = 0
-        
-        for word in words:
-            current_chunk.append(word)
-            current_length += len(word) + 1
-            
+        start = end = 0
+
+        for match in re.finditer(r"\S+", text):
+            if not current_chunk:
+                start = match.start()
+            current_chunk.append(match.group())
+            current_length += len(match.group()) + 1
+            end = match.end()
+
             if current_length >= self.chunk_size:
-                chunks.append(" ".join(current_chunk))
+                chunks.append((start, end, " ".join(current_chunk)))
                 current_chunk = []
                 current_length = 0
-        
+
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
+            chunks.append((start, end, " ".join(current_chunk)))
+
         return chunks
     
     def retrieve_relevant_chunks(
@@ -36,21 +47,37 @@ class RAGService:
         chunks: List[str], 
         top_k: int = 3
     ) -> List[str]:
-        """Find most relevant chunks using keyword matching"""
-        query_keywords = set(query.lower().split())
-        
-        # Score each chunk
-        scored_chunks = []
-        for chunk in chunks:
-            score = self._calculate_relevance(query_keywords, chunk)
-            scored_chunks.append((score, chunk))
-        
-        # Sort by score and return top K
-        scored_chunks.sort(reverse=True, key=lambda x: x[0])
-        return [chunk for _, chunk in scored_chunks[:top_k]]
-    
-    def _calculate_relevance(self, query_keywords: set, chunk: str) -> int:
-        """Calculate relevance score (simple word overlap)"""
-        chunk_words = set(chunk.lower().split())
-        overlap = query_keywords.intersection(chunk_words)
-        return len(overlap)
\ No newline at end of file
+        """
+        Rank in-memory chunks by BM25. This indexes every chunk per call;
+        stored documents are ranked from their persisted index with `rank`.
+        """
+        terms = set(self.query_terms(query))
+        postings: Dict[str, List[Tuple[int, int, int]]] = {}
+        total_terms = 0
+        for position, chunk in enumerate(chunks):
+            counts = term_frequencies(chunk)
+            length = sum(counts.values())
+            total_terms += length
+            for term in terms.intersection(counts):
+                postings.setdefault(term, []).append((position, counts[term], length))
+
+        ranked = self.rank(postings, len(chunks), total_terms, top_k)
+        return [chunks[position] for position, _ in ranked]
+
+    def query_terms(self, query: str) -> List[str]:
+        """Distinct index terms of a question"""
+        return list(dict.fromkeys(tokenize(query)))
+
+    def rank(
+        self,
+        postings: Dict[str, List[Tuple[int, int, int]]],
+        chunk_count: int,
+        term_count: int,
+        top_k: int = 3
+    ) -> List[Tuple[int, float]]:
+        """
+        Best `top_k` (chunk id, BM25 score) from the posting lists of the
+        query terms; chunks matching no term are never scored.
+        """
+        avg_length = term_count / chunk_count if chunk_count else 0.0
+        return bm25.top_k(postings, chunk_count, avg_length, top_k)
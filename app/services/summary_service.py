@@ -0,0 +1,109 @@
+"""Rolling conversation summarization"""
+from typing import Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.message import Message
+from app.repositories.message_repository import AsyncMessageRepository
+from app.services.llm_scheduler import Priority
+from app.services.llm_service import LLMService
+from app.utils.token_counter import MESSAGE_OVERHEAD, count_tokens
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{transcript}
+
+Write the updated summary. Keep every fact, name, number, decision and open
+question the assistant may need later. Be concise and do not add anything
+that was not said."""
+
+
+class SummaryService:
+    """
+    Folds older turns into a single summary row per conversation.
+
+    Everything newer than the summary's `summary_until_id` is still raw.
+    Once the raw messages outside the most recent
+    `summary_keep_recent_tokens` exceed `summary_trigger_tokens`, they are
+    merged with the previous summary into a new one. Each pass only reads
+    the not-yet-summarized tail and folds at most `summary_max_fold_tokens`
+    of its oldest messages, so the prompt stays bounded; a longer backlog
+    is worked off over the following turns.
+    """
+
+    def __init__(self, db: AsyncSession, llm_service: Optional[LLMService] = None):
+        self.message_repo = AsyncMessageRepository(db)
+        self.llm_service = llm_service or LLMService()
+
+    async def summarize(self, conversation_id: int) -> Optional[Message]:
+        summary = await self.message_repo.get_summary(conversation_id)
+        after_id = summary.summary_until_id if summary else None
+
+        keep_budget = settings.summary_keep_recent_tokens
+        to_fold = []
+        fold_tokens = 0
+        async for row in self.message_repo.iter_recent(conversation_id, after_id=after_id):
+            row_tokens = (row.tokens or count_tokens(row.content)) + MESSAGE_OVERHEAD
+            if not to_fold and row_tokens <= keep_budget:
+                keep_budget -= row_tokens
+                continue
+            to_fold.append(row)
+            fold_tokens += row_tokens
+
+        if fold_tokens < settings.summary_trigger_tokens:
+            return None
+
+        to_fold.reverse()
+        fold_budget = settings.summary_max_fold_tokens
+        for count, row in enumerate(to_fold):
+            fold_budget -= (row.tokens or count_tokens(row.content)) + MESSAGE_OVERHEAD
+            # Always fold at least one message so every pass makes progress
+            if fold_budget < 0 and count:
+                to_fold = to_fold[:count]
+                break
+
+        transcript = "\n".join(
+            f"{getattr(row.role, 'value', row.role).capitalize()}: {row.content}"
+            for row in to_fold
+        )
+        response = await self.llm_service.generate_response(
+            [{
+                "role": "user",
+                "content": SUMMARY_PROMPT.format(
+                    summary=summary.content if summary else "(none yet)",
+                    transcript=transcript
+                )
+            }],
+            use_cache=False,
+            priority=Priority.BATCH
+        )
+
+        return await self.message_repo.save_summary(
+            conversation_id,
+            content=response["content"],
+            until_id=to_fold[-1].id
+        )
+
+
+_running: Set[int] = set()
+
+
+async def summarize_in_background(conversation_id: int) -> None:
+    """Background task run after a turn; uses its own session"""
+    if not settings.summary_enabled or conversation_id in _running:
+        return
+
+    _running.add(conversation_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            await SummaryService(db).summarize(conversation_id)
+    except Exception as e:
+        print(f"Summarization failed for conversation {conversation_id}: {e}")
+    finally:
+        _running.discard(conversation_id)
@@ -0,0 +1,163 @@
+"""Streaming NDJSON export and bulk import of conversations"""
+import enum
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.conversation import ConversationMode
+from app.models.message import MessageRole
+from app.repositories.transfer_repository import (
+    CONVERSATION_FIELDS,
+    MESSAGE_FIELDS,
+    AsyncTransferRepository,
+)
+
+DATETIME_FIELDS = ("created_at", "updated_at", "last_message_at")
+
+
+def _encode(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse(record: dict, fields: Tuple[str, ...]) -> dict:
+    """Column values for the known `fields` present in an exported record"""
+    values = {f: record[f] for f in fields if f in record}
+    for field in DATETIME_FIELDS:
+        if values.get(field):
+            values[field] = datetime.fromisoformat(values[field])
+    return values
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks (e.g. a request body) into text lines"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode()
+    if buffer:
+        yield buffer.decode()
+
+
+class TransferService:
+    """
+    Moves conversations in and out as NDJSON: one `conversation` record
+    followed by its `message` records, oldest first, one JSON object per
+    line. Both directions work in batches of `transfer_batch_size` rows, so
+    memory stays flat however large the export is.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None):
+        self.db = db
+        self.transfer_repo = AsyncTransferRepository(db)
+        self.batch_size = batch_size or settings.transfer_batch_size
+
+    async def export_ndjson(self, user_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield one NDJSON line per conversation and message"""
+        async for kind, row in self.transfer_repo.stream_export(self.batch_size, user_id):
+            record = {"type": kind, **{k: _encode(v) for k, v in row.items()}}
+            yield json.dumps(record, separators=(",", ":")) + "\n"
+
+    async def import_ndjson(
+        self,
+        lines: AsyncIterable[str],
+        user_id: Optional[int] = None
+    ) -> dict:
+        """
+        Insert the conversations and messages of an export as new rows
+        (new ids; `user_id` overrides the exported owner). Messages go in
+        with one executemany per batch. Commits happen only between
+        conversations, so a malformed line raises ValueError and leaves
+        every conversation before it fully imported and nothing of the
+        one it belongs to.
+        """
+        imported = {"conversations": 0, "messages": 0}
+        pending = {"conversations": 0, "messages": 0}
+        batch: List[dict] = []
+        current = None  # (exported id, new id)
+        positions = {}  # exported message id -> offset in the conversation
+        # (summary offset, exported summarized-until id); resolved once the
+        # whole conversation is read, since a summary row updated in place
+        # can precede the messages it covers
+        summaries = []
+
+        async def finish_conversation():
+            if batch:
+                await self.transfer_repo.add_messages(batch)
+                batch.clear()
+            if summaries:
+                await self.transfer_repo.remap_summaries(
+                    current[1], [(summary, positions[until]) for summary, until in summaries]
+                )
+            if pending["conversations"] + pending["messages"] >= self.batch_size:
+                await commit()
+
+        async def commit():
+            await self.db.commit()
+            for key in imported:
+                imported[key] += pending[key]
+                pending[key] = 0
+
+        number = 0
+        try:
+            async for line in lines:
+                number += 1
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.get("type")
+
+                if kind == "conversation":
+                    if current:
+                        await finish_conversation()
+                    values = _parse(record, CONVERSATION_FIELDS)
+                    values.pop("id", None)
+                    values["mode"] = ConversationMode(values.get("mode", ConversationMode.OPEN_CHAT))
+                    if user_id is not None:
+                        values["user_id"] = user_id
+                    current = (record.get("id"), await self.transfer_repo.add_conversation(values))
+                    positions, summaries = {}, []
+                    pending["conversations"] += 1
+
+                elif kind == "message":
+                    if current is None or record.get("conversation_id") != current[0]:
+                        raise ValueError("message does not follow its conversation")
+                    values = _parse(record, MESSAGE_FIELDS)
+                    values["role"] = MessageRole(values["role"])
+                    values["conversation_id"] = current[1]
+                    until = values.pop("summary_until_id", None)
+                    if until is not None:
+                        summaries.append((len(positions), until))
+                    positions[values.pop("id", len(positions))] = len(positions)
+                    batch.append(values)
+                    pending["messages"] += 1
+                    if len(batch) >= self.batch_size:
+                        await self.transfer_repo.add_messages(batch)
+                        batch.clear()
+
+                else:
+                    raise ValueError(f"unknown record type {kind!r}")
+
+            if current:
+                await finish_conversation()
+            await commit()
+        except (ValueError, KeyError, TypeError) as e:
+            # json.JSONDecodeError is a ValueError
+            await self.db.rollback()
+            raise ValueError(
+                f"Line {number}: invalid record ({e}); imported "
+                f"{imported['conversations']} conversation(s) before it"
+            ) from e
+        except BaseException:
+            await self.db.rollback()
+            raise
+
+        return imported
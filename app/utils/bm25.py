@@ -0,0 +1,90 @@
+"""BM25 ranking
+
+Text is reduced to index terms by lower-casing, dropping English
+stopwords and a light suffix-stripping stemmer, so "capitals" and
+"capital" meet and "the" never decides a ranking. Scores come from
+posting lists (term -> chunks containing it, with term frequency and
+chunk length), so ranking a query only touches the postings of its own
+terms. The best `k` are picked with a heap instead of sorting every
+candidate.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because
+been before being below between both but by can could did do does doing down
+during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself
+no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your yours
+yourself yourselves
+""".split())
+
+_WORD = re.compile(r"[^\W_]+")
+
+# (suffix, replacement, shortest stem left behind)
+_SUFFIXES = (
+    ("ies", "y", 2),
+    ("sses", "ss", 2),
+    ("ing", "", 3),
+    ("ed", "", 3),
+    ("xes", "x", 1),
+    ("shes", "sh", 1),
+    ("es", "e", 3),
+    ("s", "", 3),
+)
+
+
+def stem(word: str) -> str:
+    """Strip one common English inflection (plural, -ing, -ed)"""
+    for suffix, replacement, shortest in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= shortest:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                return word
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of `text`, in order"""
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def term_frequencies(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+def top_k(
+    postings: Dict[str, Iterable[Tuple[int, int, int]]],
+    doc_count: int,
+    avg_length: float,
+    k: int,
+    k1: float = K1,
+    b: float = B
+) -> List[Tuple[int, float]]:
+    """
+    Best `k` (doc id, score) by BM25 for the query terms in `postings`,
+    each mapping to (doc id, term frequency, doc length) for every doc
+    containing the term. Ties go to the lower doc id.
+    """
+    avg_length = avg_length or 1.0
+    scores: Dict[int, float] = {}
+    for entries in postings.values():
+        entries = list(entries)
+        df = len(entries)
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        for doc_id, tf, length in entries:
+            saturation = tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf * saturation
+
+    best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+    return best
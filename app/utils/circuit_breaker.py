@@ -0,0 +1,120 @@
+"""Error-rate circuit breaker for upstream calls"""
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from app.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open once the error rate over the last `window` calls
+    crosses `error_threshold` (after at least `min_requests` calls).
+    open -> half_open after `cooldown_seconds`, letting one trial call
+    through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_threshold: float = 0.5,
+        min_requests: int = 10,
+        window: int = 50,
+        cooldown_seconds: float = 30.0
+    ):
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._cooled_down():
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._cooled_down():
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.error_threshold
+            ):
+                self._trip()
+
+    def abandon(self) -> None:
+        """A permitted call was cancelled before it produced an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        outcomes = list(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": len(outcomes),
+            "error_rate": outcomes.count(False) / len(outcomes) if outcomes else 0.0,
+        }
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.cooldown_seconds
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                error_threshold=settings.llm_breaker_error_threshold,
+                min_requests=settings.llm_breaker_min_requests,
+                window=settings.llm_breaker_window,
+                cooldown_seconds=settings.llm_breaker_cooldown_seconds,
+            )
+        return _breakers[model]
+
+
+def breaker_stats() -> dict:
+    return {model: breaker.stats() for model, breaker in _breakers.items()}
@@ -1,27 +1,98 @@
 # app/utils/context_manager.py
+from heapq import merge
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.utils.token_counter import MESSAGE_OVERHEAD, count_message_tokens, count_tokens
+
 
 class ContextManager:
     def __init__(self, max_tokens: int = 3000):
         self.max_tokens = max_tokens
-    
+
     def truncate_messages(self, messages: List[Dict]) -> List[Dict]:
         """Keep only recent messages that fit in context"""
         total_tokens = 0
         truncated = []
-        
+
         # Iterate from most recent to oldest
         for message in reversed(messages):
-            msg_tokens = self._count_tokens(message["content"])
-            
+            msg_tokens = self._count_tokens(message)
+
             if total_tokens + msg_tokens <= self.max_tokens:
-                truncated.insert(0, message)
+                truncated.append(message)
                 total_tokens += msg_tokens
             else:
                 break
-        
+
+        truncated.reverse()
         return truncated
-    
-    def _count_tokens(self, text: str) -> int:
-        """Estimate token count (rough approximation)"""
-        # More accurate: use tiktoken library
-        return len(text.split()) * 1.3  # 1 word ≈ 1.3 tokens
\ No newline at end of file
+
+    def _count_tokens(self, message: Dict) -> int:
+        """Prompt tokens for a message (stored count when available)"""
+        return count_message_tokens(message)
+
+
+class ContextBuilder(ContextManager):
+    """
+    Builds the prompt history for a turn straight from the database.
+
+    System and pinned messages, and the rolling summary standing in for
+    older turns, are always included. The remaining budget is filled with
+    the most recent messages not yet folded into the summary, read
+    newest-first in small batches and using the token counts stored on
+    each row, so the cost is linear in the number of messages that fit.
+    """
+
+    def __init__(self, message_repo, max_tokens: Optional[int] = None, batch_size: int = 50):
+        super().__init__(max_tokens or settings.context_max_tokens)
+        self.message_repo = message_repo
+        self.batch_size = batch_size
+
+    async def build(self, conversation_id: int, new_message: Optional[Dict] = None) -> List[Dict]:
+        """History for the next LLM call, oldest first, ending with `new_message`"""
+        budget = self.max_tokens
+        if new_message is not None:
+            budget -= self._count_tokens(new_message)
+
+        summary = await self.message_repo.get_summary(conversation_id)
+        after_id = None
+        if summary is not None:
+            after_id = summary.summary_until_id
+            budget -= self._row_tokens(summary)
+
+        pinned = await self.message_repo.get_pinned(conversation_id)
+        budget -= sum(self._row_tokens(row) for row in pinned)
+
+        recent = []
+        async for row in self.message_repo.iter_recent(
+            conversation_id, self.batch_size, after_id=after_id
+        ):
+            row_tokens = self._row_tokens(row)
+            if row_tokens > budget:
+                break
+            recent.append(row)
+            budget -= row_tokens
+        recent.reverse()
+
+        history = []
+        if summary is not None:
+            history.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary.content}"
+            })
+        history += [
+            {"role": self._role(row.role), "content": row.content}
+            for row in merge(pinned, recent, key=lambda row: row.id)
+        ]
+        if new_message is not None:
+            history.append(new_message)
+        return history
+
+    def _row_tokens(self, row) -> int:
+        # Rows written before counts were stored have tokens = 0/NULL
+        tokens = row.tokens or count_tokens(row.content)
+        return tokens + MESSAGE_OVERHEAD
+
+    def _role(self, role) -> str:
+        return getattr(role, "value", role)
@@ -0,0 +1,55 @@
+"""Rolling latency statistics per upstream model"""
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """Keeps the last `window` samples plus an exponential moving average"""
+
+    def __init__(self, window: int = 200, alpha: float = 0.2):
+        self._samples = deque(maxlen=window)
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma = self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.count,
+            "ewma": self.ewma,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_lock = threading.Lock()
+
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    with _lock:
+        if model not in _trackers:
+            _trackers[model] = LatencyTracker()
+        return _trackers[model]
+
+
+def latency_stats() -> dict:
+    return {model: tracker.stats() for model, tracker in _trackers.items()}
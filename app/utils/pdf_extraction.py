@@ -0,0 +1,194 @@
+"""Parallel PDF text extraction
+
+Text extraction with PyPDF2 is pure-Python and CPU-bound, so threads do
+not help. Large PDFs are split into page ranges that worker processes
+extract in parallel; results are put back in page order. Each page runs
+under a timer in its worker, so one pathological page costs at most
+`page_timeout` seconds and comes back as empty text instead of stalling
+the whole document.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+
+# One parsed document per worker process: consecutive ranges of the same
+# file skip re-reading its cross-reference table. Dropped after a worker's
+# last range of the document, so an idle worker holds no parsed PDF
+_reader: Tuple[Optional[str], Optional[PdfReader]] = (None, None)
+
+
+def _open(path: str) -> PdfReader:
+    global _reader
+    if _reader[0] != path:
+        _reader = (path, PdfReader(path))
+    return _reader[1]
+
+
+def extract_range(
+    path: str,
+    start: int,
+    stop: int,
+    page_timeout: Optional[float],
+    keep_open: bool = False
+) -> List[Optional[str]]:
+    """
+    Text of pages [start, stop) of the PDF at `path`; None for a page that
+    took longer than `page_timeout`. Timeouts need SIGALRM, so they only
+    apply in the main thread of a process (always true in pool workers).
+    The parsed PDF stays cached for the next range only if `keep_open`.
+    """
+    global _reader
+    reader = _open(path)
+    timed = (
+        page_timeout is not None
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+
+    texts = []
+    try:
+        for number in range(start, stop):
+            text = None
+            try:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                text = reader.pages[number].extract_text() or ""
+            except PageTimeout:
+                pass
+            finally:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            texts.append(text)
+    finally:
+        if timed:
+            signal.signal(signal.SIGALRM, previous)
+        if not keep_open:
+            _reader = (None, None)
+    return texts
+
+
+def page_ranges(total: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+
+
+class PdfExtractor:
+    """
+    A process pool shared by every ingestion job in this process. Workers
+    are started with `spawn` so they do not inherit the server's threads,
+    sockets or database connections.
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        pages_per_task: int = 8,
+        page_timeout: Optional[float] = 30.0
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.page_timeout = page_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def extract(
+        self,
+        path: str,
+        on_page: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[List[str], List[int]]:
+        """
+        Extract every page of the PDF at `path`. Returns the page texts in
+        order and the (1-based) numbers of pages that timed out.
+        `on_page(pages_done, pages_total)` is called as ranges finish.
+        Raises TimeoutError if no range finishes within the combined
+        timeouts of one range (a worker stuck where the timer cannot
+        interrupt it).
+        """
+        total = len(PdfReader(path).pages)
+        ranges = page_ranges(total, self.pages_per_task)
+        pool = self._get_pool()
+
+        # Ranges are handed out in order, so a worker's final range of this
+        # document is normally among the last `processes`; those drop the
+        # worker's cached reader
+        keep_until = len(ranges) - self.processes
+        futures = {
+            pool.submit(
+                extract_range, path, start, stop, self.page_timeout, index < keep_until
+            ): (start, stop)
+            for index, (start, stop) in enumerate(ranges)
+        }
+        # Backstop on top of the per-page timers; one spare page for start-up
+        limit = None
+        if self.page_timeout is not None:
+            limit = self.page_timeout * (self.pages_per_task + 1)
+
+        texts: List[Optional[str]] = [None] * total
+        done = 0
+        try:
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=limit, return_when=FIRST_COMPLETED)
+                if not finished:
+                    # The stuck worker would keep its process forever; replace
+                    # the pool (failing other jobs' ranges still running in it)
+                    self._discard(pool)
+                    raise TimeoutError(f"PDF extraction did not finish within {limit:.0f}s")
+                for future in finished:
+                    start, stop = futures[future]
+                    texts[start:stop] = future.result()
+                    done += stop - start
+                    if on_page:
+                        on_page(done, total)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            with self._lock:
+                self._pool = None
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+        timed_out = [number + 1 for number, text in enumerate(texts) if text is None]
+        return [text or "" for text in texts], timed_out
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        """Shut `pool` down, terminating its workers, and start afresh next time"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,101 @@
+"""PDF extraction benchmark
+
+Builds a large synthetic PDF (dense text pages with several fonts) and
+extracts it serially in this process, then with PdfExtractor pools of
+increasing size. The pool is warmed up before timing so process start-up
+is not counted; each run reports pages per second and the speed-up over
+serial.
+
+Usage:
+    python -m benchmarks.pdf_extraction [--pages 500] [--lines 60]
+        [--processes 1 2 4] [--pages-per-task 8]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.utils.pdf_extraction import PdfExtractor, extract_range
+
+WORDS = (
+    "ingestion retrieval conversation latency throughput document page "
+    "extraction parallel process worker index chunk token summary archive"
+).split()
+
+
+def synthetic_pdf(pages: int, lines: int) -> bytes:
+    """A PDF of `pages` pages, each with `lines` lines of random words"""
+    rng = random.Random(0)
+    fonts = b"<< /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> " \
+            b"/F2 << /Type /Font /Subtype /Type1 /BaseFont /Times-Roman >> >>"
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", fonts]
+    kids = []
+    for _ in range(pages):
+        ops = [b"BT 10 TL 40 760 Td"]
+        for n in range(lines):
+            words = " ".join(rng.choice(WORDS) for _ in range(12))
+            ops.append(b"/F%d 9 Tf (%s) Tj T*" % (n % 2 + 1, words.encode()))
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+        kids.append(len(objects) + 1)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Contents %d 0 R /Resources << /Font 3 0 R >> >>" % (len(objects) + 2)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=60, help="text lines per page")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(synthetic_pdf(args.pages, args.lines))
+    try:
+        print(f"{args.pages} pages x {args.lines} lines, {os.path.getsize(path) // 1024} KiB, "
+              f"{os.cpu_count()} CPU(s)\n")
+        print(f"{'engine':<16}{'seconds':>10}{'pages/s':>10}{'speed-up':>10}")
+
+        started = time.perf_counter()
+        serial = extract_range(path, 0, args.pages, page_timeout=None)
+        baseline = time.perf_counter() - started
+        print(f"{'serial':<16}{baseline:>10.2f}{args.pages / baseline:>10.0f}{1:>10.2f}")
+
+        for processes in args.processes:
+            extractor = PdfExtractor(processes, args.pages_per_task)
+            try:
+                extractor.extract(path)  # start the workers
+                started = time.perf_counter()
+                pages, _ = extractor.extract(path)
+                elapsed = time.perf_counter() - started
+            finally:
+                extractor.shutdown()
+            assert pages == serial
+            print(f"{f'{processes} process(es)':<16}{elapsed:>10.2f}"
+                  f"{args.pages / elapsed:>10.0f}{baseline / elapsed:>10.2f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""SQLite concurrency benchmark
+
+Simulates several uvicorn workers sharing one SQLite file. Each worker
+process runs writer threads that persist chat turns (two messages plus
+the conversation counter update, in one transaction) and reader threads
+that load the latest page of history, for a fixed duration.
+
+Three configurations are compared:
+
+    default     engine as the app used to create it (no pragmas, no pool tuning)
+    production  the SQLite production profile from Settings
+    writer      production profile plus a dedicated writer connection
+
+Usage:
+    python -m benchmarks.sqlite_concurrency [--workers 2] [--writers 2]
+        [--readers 2] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import make_engine, routing_session_class, upgrade_database
+from app.models.conversation import Conversation
+from app.models.message import Message, MessageRole
+
+CONVERSATIONS = 50
+
+
+def _sessions(url: str, profile: str):
+    if profile == "default":
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        return sessionmaker(bind=engine)
+
+    settings.sqlite_production = True
+    engine = make_engine(url)
+    if profile == "writer":
+        writer = make_engine(url, writer=True)
+        return sessionmaker(class_=routing_session_class(engine, writer))
+    return sessionmaker(bind=engine)
+
+
+def _write_turns(Session, deadline, seed, counts):
+    i = seed
+    while time.monotonic() < deadline:
+        conversation_id = i % CONVERSATIONS + 1
+        i += 1
+        now = datetime.utcnow()
+        with Session() as db:
+            try:
+                db.execute(insert(Message), [
+                    {"conversation_id": conversation_id, "role": MessageRole.USER,
+                     "content": "question " * 20, "tokens": 40, "created_at": now},
+                    {"conversation_id": conversation_id, "role": MessageRole.ASSISTANT,
+                     "content": "answer " * 80, "tokens": 160, "created_at": now},
+                ])
+                db.execute(
+                    update(Conversation)
+                    .where(Conversation.id == conversation_id)
+                    .values(
+                        message_count=Conversation.message_count + 2,
+                        total_tokens=Conversation.total_tokens + 200,
+                        last_message_at=now,
+                        updated_at=now
+                    )
+                )
+                db.commit()
+                counts["turns"] += 1
+            except OperationalError:
+                db.rollback()
+                counts["errors"] += 1
+
+
+def _read_history(Session, deadline, seed, counts):
+    i = seed
+    while time.monotonic() < deadline:
+        conversation_id = i % CONVERSATIONS + 1
+        i += 1
+        with Session() as db:
+            try:
+                db.execute(
+                    select(Message)
+                    .where(Message.conversation_id == conversation_id)
+                    .order_by(Message.created_at.desc(), Message.id.desc())
+                    .limit(50)
+                ).all()
+                counts["reads"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+
+def _worker(url, profile, writers, readers, seconds, worker_id, results):
+    Session = _sessions(url, profile)
+    deadline = time.monotonic() + seconds
+    counts = {"turns": 0, "reads": 0, "errors": 0}
+    threads = [
+        threading.Thread(target=_write_turns, args=(Session, deadline, worker_id * 1000 + n, counts))
+        for n in range(writers)
+    ] + [
+        threading.Thread(target=_read_history, args=(Session, deadline, worker_id * 1000 + n, counts))
+        for n in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(counts)
+
+
+def run(profile: str, args) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    url = f"sqlite:///{path}"
+    try:
+        engine = create_engine(url)
+        upgrade_database(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Conversation), [{"user_id": 1} for _ in range(CONVERSATIONS)])
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(url, profile, args.writers, args.readers, args.seconds, n, results)
+            )
+            for n in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = {"turns": 0, "reads": 0, "errors": 0}
+        for _ in processes:
+            for key, value in results.get().items():
+                totals[key] += value
+        for process in processes:
+            process.join()
+        return totals
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=2, help="writer threads per worker")
+    parser.add_argument("--readers", type=int, default=2, help="reader threads per worker")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x ({args.writers} writers + {args.readers} readers), "
+          f"{args.seconds:g}s per profile\n")
+    print(f"{'profile':<12}{'turns/s':>10}{'reads/s':>10}{'lock errors':>13}")
+    for profile in ("default", "production", "writer"):
+        totals = run(profile, args)
+        print(
+            f"{profile:<12}{totals['turns'] / args.seconds:>10.0f}"
+            f"{totals['reads'] / args.seconds:>10.0f}{totals['errors']:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Test token-budgeted context selection"""
+import pytest
+
+from app.utils.context_manager import ContextBuilder, ContextManager
+
+
+def test_context_manager_truncates_to_budget():
+    """Test that ContextManager imports and keeps recent messages"""
+    manager = ContextManager(max_tokens=30)
+    messages = [
+        {"role": "user", "content": "old", "tokens": 20},
+        {"role": "assistant", "content": "newer", "tokens": 10},
+        {"role": "user", "content": "newest", "tokens": 10},
+    ]
+    assert [m["content"] for m in manager.truncate_messages(messages)] == ["newer", "newest"]
+
+
+class _FakeRow:
+    def __init__(self, id, role, content, tokens):
+        self.id, self.role, self.content, self.tokens = id, role, content, tokens
+
+
+class _FakeMessageRepo:
+    def __init__(self, rows, pinned_ids):
+        self.rows = rows
+        self.pinned_ids = pinned_ids
+        self.fetched = 0
+
+    async def get_summary(self, conversation_id):
+        return None
+
+    async def get_pinned(self, conversation_id):
+        return [r for r in self.rows if r.id in self.pinned_ids or r.role == "system"]
+
+    async def iter_recent(self, conversation_id, batch_size, after_id=None):
+        for row in reversed(self.rows):
+            if row.id in self.pinned_ids or row.role == "system":
+                continue
+            self.fetched += 1
+            yield row
+
+
+@pytest.mark.asyncio
+async def test_context_builder_keeps_pinned_and_recent_within_budget():
+    """Test budgeted selection, pinned retention and early stop"""
+    rows = [_FakeRow(1, "system", "Be brief.", 5)]
+    rows += [_FakeRow(i, "user" if i % 2 else "assistant", f"m{i}", 20) for i in range(2, 102)]
+    repo = _FakeMessageRepo(rows, pinned_ids={3})
+
+    # 2 pinned/system (5+4, 20+4) + new (tokens 6+4) leave room for 3 recent rows
+    builder = ContextBuilder(repo, max_tokens=120)
+    history = await builder.build(1, {"role": "user", "content": "next", "tokens": 6})
+
+    assert [m["content"] for m in history] == ["Be brief.", "m3", "m99", "m100", "m101", "next"]
+    assert repo.fetched == 4  # stopped at the first message that did not fit
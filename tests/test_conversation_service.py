@@ -2,8 +2,11 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from sqlalchemy import event
+
 from app.main import app
-from app.database import init_db
+from app.database import AsyncSessionLocal, async_writer_engine, init_db
+from app.services.conversation_service import ConversationService
 from app.services.llm_service import LLMService
 
 
@@ -21,7 +24,7 @@ def mock_llm(monkeypatch):
     """
     Mock LLMService.generate_response so tests don't call the real Groq API.
     """
-    async def fake_generate_response(self, messages):
+    async def fake_generate_response(self, messages, **kwargs):
         # Return a fake response instead of calling Groq
         return {
             "content": "test-reply",
@@ -117,3 +120,69 @@ def test_delete_conversation():
     response = client.get(f"/conversations/{conversation_id}")
     assert response.status_code == 404
     assert response.json()["detail"] == "Conversation not found"
+
+
+def test_stream_message_persists_reply(monkeypatch):
+    """Test SSE streaming of a reply and that the full reply is saved"""
+    async def fake_stream_response(self, messages, **kwargs):
+        for piece in ["test-", "stream"]:
+            yield {"event": "delta", "content": piece}
+        yield {"event": "done", "content": "test-stream", "tokens": 7}
+
+    monkeypatch.setattr(LLMService, "stream_response", fake_stream_response)
+
+    response = client.post("/conversations/", json={"first_message": "Hi"})
+    conversation_id = response.json()["conversation_id"]
+
+    response = client.post(
+        f"/conversations/{conversation_id}/messages?stream=true",
+        json={"content": "Stream please"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: delta\ndata: {"content": "test-"}' in response.text
+    assert "event: done" in response.text
+
+    convo = client.get(f"/conversations/{conversation_id}").json()
+    assert convo["messages"][-1]["content"] == "test-stream"
+
+
+def test_stream_message_unknown_conversation():
+    """Test that streaming into a missing conversation returns 404"""
+    response = client.post(
+        "/conversations/999999/messages?stream=true",
+        json={"content": "Anyone there?"}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_turn_is_written_in_one_transaction():
+    """Test that a turn's messages and counters are written together"""
+    async with AsyncSessionLocal() as db:
+        service = ConversationService(db)
+        created = await service.create_conversation(1, "First", "open_chat")
+        conversation_id = created["conversation_id"]
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0].upper())
+
+        event.listen(async_writer_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            reply = await service.add_message(conversation_id, "Second")
+        finally:
+            event.remove(async_writer_engine.sync_engine, "before_cursor_execute", record)
+
+        # Ids come back from RETURNING: no refresh SELECTs after the insert
+        writes = statements[statements.index("INSERT"):]
+        assert set(writes) == {"INSERT", "UPDATE"}
+        assert writes[-1] == "UPDATE"
+
+        convo = await service.conversation_repo.get(conversation_id)
+        await db.refresh(convo)
+        messages = await service.message_repo.get_by_conversation(conversation_id)
+        assert [m.content for m in messages] == ["First", "test-reply", "Second", "test-reply"]
+        assert messages[-1].id == reply["message_id"]
+        assert convo.total_tokens == sum(m.tokens for m in messages)
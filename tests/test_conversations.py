@@ -0,0 +1,363 @@
+"""Test conversation listing"""
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import init_db
+from app.services.llm_service import LLMService
+
+
+@pytest.fixture(autouse=True)
+def mock_llm(monkeypatch):
+    init_db()
+
+    async def fake_generate_response(self, messages, **kwargs):
+        return {"content": "test-reply", "tokens": 3}
+
+    monkeypatch.setattr(LLMService, "generate_response", fake_generate_response)
+
+
+client = TestClient(app)
+
+
+def test_list_conversations_keyset_pages_and_filters():
+    """Test cursor paging, message counts and mode/document filters"""
+    document_id = random.randint(10**6, 10**9)
+    created = []
+    for i in range(5):
+        response = client.post("/conversations/", json={
+            "first_message": f"hello {i}",
+            "mode": "rag" if i % 2 else "open_chat",
+            "document_id": document_id
+        })
+        created.append(response.json()["conversation_id"])
+    client.post(f"/conversations/{created[-1]}/messages", json={"content": "again"})
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "document_id": document_id}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/conversations/", params=params).json()
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [c["id"] for c in seen] == created[::-1]
+    assert [c["message_count"] for c in seen] == [4, 2, 2, 2, 2]
+
+    rag = client.get("/conversations/", params={"mode": "rag", "document_id": document_id})
+    assert [c["id"] for c in rag.json()["items"]] == [created[3], created[1]]
+
+
+def test_list_conversations_rejects_bad_cursor():
+    response = client.get("/conversations/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_turn_counters_and_reconcile():
+    """Test per-turn counters and that reconcile-counters repairs drift"""
+    from app.cli import main
+    from app.database import SessionLocal
+    from app.models.conversation import Conversation
+
+    conversation_id = client.post("/conversations/", json={"first_message": "count me"}).json()["conversation_id"]
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "and me"})
+
+    db = SessionLocal()
+    try:
+        convo = db.get(Conversation, conversation_id)
+        assert convo.message_count == 4
+        expected = (convo.message_count, convo.total_tokens, convo.last_message_at)
+        assert convo.total_tokens > 0
+
+        convo.message_count, convo.total_tokens, convo.last_message_at = 0, 0, None
+        db.commit()
+
+        assert main(["reconcile-counters", "--conversation-id", str(conversation_id)]) == 0
+        db.refresh(convo)
+        assert (convo.message_count, convo.total_tokens, convo.last_message_at) == expected
+    finally:
+        db.close()
+
+
+def test_message_history_pages_newest_first():
+    """Test before-cursor paging over messages and the detail view's latest page"""
+    conversation_id = client.post("/conversations/", json={"first_message": "m0"}).json()["conversation_id"]
+    for i in range(1, 4):
+        client.post(f"/conversations/{conversation_id}/messages", json={"content": f"m{i}"})
+
+    contents = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["before"] = cursor
+        page = client.get(f"/conversations/{conversation_id}/messages", params=params).json()
+        assert len(page["items"]) <= 3
+        contents += [m["content"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert contents == ["test-reply", "m3", "test-reply", "m2", "test-reply", "m1", "test-reply", "m0"]
+
+    detail = client.get(f"/conversations/{conversation_id}", params={"limit": 2}).json()
+    assert detail["message_count"] == 8
+    assert [m["content"] for m in detail["messages"]] == ["m3", "test-reply"]
+    assert detail["next_cursor"] is not None
+
+    assert client.get("/conversations/999999/messages").status_code == 404
+
+
+def _row_counts(conversation_ids):
+    from sqlalchemy import func, select
+    from app.database import SessionLocal
+    from app.models.conversation import Conversation
+    from app.models.message import Message
+
+    db = SessionLocal()
+    try:
+        conversations = db.scalar(select(func.count()).where(Conversation.id.in_(conversation_ids)))
+        messages = db.scalar(select(func.count()).where(Message.conversation_id.in_(conversation_ids)))
+        return conversations, messages
+    finally:
+        db.close()
+
+
+def test_bulk_delete_hides_then_purges():
+    """Test bulk soft delete and the background purge that follows it"""
+    ids = [
+        client.post("/conversations/", json={"first_message": f"bye {i}"}).json()["conversation_id"]
+        for i in range(3)
+    ]
+
+    response = client.post("/conversations/bulk-delete", json={"conversation_ids": ids[:2] + [999999]})
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted"]) == ids[:2]
+    assert client.get(f"/conversations/{ids[0]}").status_code == 404
+    assert client.get(f"/conversations/{ids[2]}").status_code == 200
+
+    # The purge ran as a background task after the response
+    assert _row_counts(ids[:2]) == (0, 0)
+    assert _row_counts(ids[2:]) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_purge_works_in_bounded_batches():
+    """Test that each purge batch removes at most batch_size rows"""
+    from app.database import AsyncSessionLocal
+    from app.repositories.conversation_repository import AsyncConversationRepository
+    from app.services.purge_service import PurgeService
+
+    conversation_id = client.post("/conversations/", json={"first_message": "big"}).json()["conversation_id"]
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "more"})
+
+    async with AsyncSessionLocal() as db:
+        repo = AsyncConversationRepository(db)
+        assert await repo.soft_delete([conversation_id]) == [conversation_id]
+        assert await repo.purge_batch(3) == 3
+        assert _row_counts([conversation_id]) == (1, 1)
+        assert await PurgeService(db, batch_size=3).purge() == 2
+    assert _row_counts([conversation_id]) == (0, 0)
+
+
+def test_hard_delete_cascades_in_the_database():
+    from app.database import SessionLocal
+    from app.repositories.conversation_repository import ConversationRepository
+
+    conversation_id = client.post("/conversations/", json={"first_message": "gone"}).json()["conversation_id"]
+    db = SessionLocal()
+    try:
+        assert ConversationRepository(db).delete(conversation_id)
+    finally:
+        db.close()
+    assert _row_counts([conversation_id]) == (0, 0)
+
+
+def test_archived_conversation_rehydrates_on_open():
+    """Test archiving idle conversations and transparent restore on open"""
+    from app.cli import main
+    from app.database import SessionLocal
+    from app.models.message_archive import MessageArchive
+
+    conversation_id = client.post("/conversations/", json={"first_message": "old " * 500}).json()["conversation_id"]
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "still there?"})
+    pin = client.get(f"/conversations/{conversation_id}").json()["messages"][0]["id"]
+    client.put(f"/conversations/{conversation_id}/messages/{pin}/pin", json={"pinned": True})
+    before = client.get(f"/conversations/{conversation_id}").json()
+
+    # --days 0 treats every conversation as idle
+    assert main(["archive-inactive", "--days", "0", "--limit", "100000"]) == 0
+    assert _row_counts([conversation_id]) == (1, 0)
+    assert main(["reconcile-counters", "--conversation-id", str(conversation_id)]) == 0
+    db = SessionLocal()
+    try:
+        archive = db.query(MessageArchive).filter_by(conversation_id=conversation_id).one()
+        assert archive.message_count == 4
+        assert len(archive.payload) < sum(len(m["content"]) for m in before["messages"])
+    finally:
+        db.close()
+
+    listed = client.get("/conversations/", params={"limit": 100}).json()["items"]
+    assert any(c["id"] == conversation_id and c["message_count"] == 4 for c in listed)
+
+    after = client.get(f"/conversations/{conversation_id}").json()
+    assert _row_counts([conversation_id]) == (1, 4)
+    assert after["messages"] == before["messages"]
+    assert client.put(
+        f"/conversations/{conversation_id}/messages/{pin}/pin", json={"pinned": False}
+    ).status_code == 200
+    assert client.post(
+        f"/conversations/{conversation_id}/messages", json={"content": "back"}
+    ).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_concurrent_opens_restore_an_archive_once():
+    """Test that racing opens of an archived conversation restore it once"""
+    import asyncio
+    from datetime import datetime, timedelta
+
+    from app.database import AsyncSessionLocal
+    from app.repositories.archive_repository import AsyncArchiveRepository
+    from app.services.conversation_service import ConversationService
+
+    conversation_id = client.post("/conversations/", json={"first_message": "race"}).json()["conversation_id"]
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "again"})
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "once more"})
+
+    async with AsyncSessionLocal() as db:
+        repo = AsyncArchiveRepository(db)
+        # Not idle for a day: skipped and left untouched
+        assert await repo.archive(conversation_id, datetime.utcnow() - timedelta(days=1)) is None
+        assert _row_counts([conversation_id]) == (1, 6)
+        assert await repo.archive(conversation_id, datetime.utcnow() + timedelta(seconds=1)) == 6
+    assert _row_counts([conversation_id]) == (1, 0)
+
+    async def open_history():
+        async with AsyncSessionLocal() as db:
+            return await ConversationService(db).list_messages(conversation_id)
+
+    first, second = await asyncio.gather(open_history(), open_history())
+    assert _row_counts([conversation_id]) == (1, 6)
+    assert first["items"] == second["items"]
+    assert len(first["items"]) == 6
+
+
+def test_export_import_round_trip(monkeypatch):
+    """Test NDJSON export streams every conversation and import recreates it"""
+    import json
+
+    from app.cli import main
+    from app.config import settings
+    from app.database import SessionLocal
+    from app.models.conversation import Conversation
+    from app.models.message import Message, MessageRole
+    from sqlalchemy import select
+
+    monkeypatch.setattr(settings, "transfer_batch_size", 2)
+    ids = []
+    for i in range(2):
+        conversation_id = client.post("/conversations/", json={"first_message": f"export {i}"}).json()["conversation_id"]
+        client.post(f"/conversations/{conversation_id}/messages", json={"content": f"more {i}"})
+        ids.append(conversation_id)
+    db = SessionLocal()
+    try:
+        first = db.query(Message).filter_by(conversation_id=ids[0]).order_by(Message.id).first()
+        db.add(Message(conversation_id=ids[0], role=MessageRole.SYSTEM, content="summary",
+                       is_summary=True, summary_until_id=first.id))
+        db.commit()
+    finally:
+        db.close()
+    # Archived conversations are exported from their blob
+    assert main(["archive-inactive", "--days", "0", "--limit", "100000"]) == 0
+
+    response = client.get("/conversations/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    exported = [r for r in records if r.get("id") in ids and r["type"] == "conversation"
+                or r.get("conversation_id") in ids]
+    assert [r["type"] for r in exported] == ["conversation"] + ["message"] * 5 + ["conversation"] + ["message"] * 4
+    assert exported[0]["message_count"] == 4
+
+    body = "".join(json.dumps(r) + "\n" for r in exported)
+    assert client.post("/conversations/import", content=body).json() == {"conversations": 2, "messages": 9}
+
+    db = SessionLocal()
+    try:
+        # Imported rows keep their exported timestamps but get new ids
+        new_ids = sorted(db.scalars(select(Conversation.id).order_by(Conversation.id.desc()).limit(2)))
+    finally:
+        db.close()
+    for old_id, new_id in zip(ids, new_ids):
+        old = client.get(f"/conversations/{old_id}").json()
+        new = client.get(f"/conversations/{new_id}").json()
+        assert new["message_count"] == old["message_count"] == 4
+        assert [(m["role"], m["content"]) for m in new["messages"]] == [
+            (m["role"], m["content"]) for m in old["messages"]
+        ]
+    db = SessionLocal()
+    try:
+        summary = db.query(Message).filter_by(conversation_id=new_ids[0], is_summary=True).one()
+        first = db.query(Message).filter_by(conversation_id=new_ids[0]).order_by(Message.id).first()
+        assert summary.summary_until_id == first.id
+    finally:
+        db.close()
+
+    bad = body + '{"type": "message", "conversation_id": 999999999, "role": "user"}\n'
+    response = client.post("/conversations/import", content=bad)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(f"Line {len(exported) + 1}:")
+
+
+def test_import_resolves_summary_that_precedes_its_messages():
+    """Test a summary updated in place after later messages survives a round trip"""
+    import json
+
+    from app.database import SessionLocal
+    from app.models.message import Message, MessageRole
+    from sqlalchemy import func, select
+
+    conversation_id = client.post("/conversations/", json={"first_message": "early"}).json()["conversation_id"]
+    db = SessionLocal()
+    try:
+        summary = Message(conversation_id=conversation_id, role=MessageRole.SYSTEM, content="summary 1",
+                          is_summary=True)
+        db.add(summary)
+        db.commit()
+        summary_id = summary.id
+    finally:
+        db.close()
+    client.post(f"/conversations/{conversation_id}/messages", json={"content": "later"})
+    db = SessionLocal()
+    try:
+        # Second summarization: the same row now covers messages after it
+        last = db.scalar(select(func.max(Message.id)).where(Message.conversation_id == conversation_id))
+        db.query(Message).filter_by(id=summary_id).update(
+            {"content": "summary 2", "summary_until_id": last}
+        )
+        db.commit()
+        until_content = db.get(Message, last).content
+    finally:
+        db.close()
+
+    records = [json.loads(line) for line in client.get("/conversations/export").text.splitlines()]
+    exported = [r for r in records if r.get("id") == conversation_id and r["type"] == "conversation"
+                or r.get("conversation_id") == conversation_id]
+    body = "".join(json.dumps(r) + "\n" for r in exported)
+    assert client.post("/conversations/import", content=body).json() == {"conversations": 1, "messages": 5}
+
+    db = SessionLocal()
+    try:
+        new_id = db.scalar(select(func.max(Message.conversation_id)))
+        imported = db.query(Message).filter_by(conversation_id=new_id, is_summary=True).one()
+        assert imported.content == "summary 2"
+        assert db.get(Message, imported.summary_until_id).content == until_content
+        assert db.get(Message, imported.summary_until_id).conversation_id == new_id
+    finally:
+        db.close()
@@ -0,0 +1,68 @@
+"""Test the SQLite production profile and writer routing"""
+from sqlalchemy import insert, select, text
+
+from app.database import make_engine, routing_session_class, upgrade_database
+from app.models.conversation import Conversation
+
+
+def test_sqlite_profile_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() < 0
+    assert engine.pool.size() == 5
+    engine.dispose()
+
+
+def test_routing_session_sends_writes_to_writer(tmp_path):
+    url = f"sqlite:///{tmp_path / 'routing.db'}"
+    reader, writer = make_engine(url), make_engine(url, writer=True)
+    upgrade_database(writer)
+    Session = routing_session_class(reader, writer)
+
+    with Session() as db:
+        assert db.get_bind(clause=select(Conversation)) is reader
+        db.execute(insert(Conversation).values(user_id=1))
+        # The rest of the transaction stays on the writer
+        assert db.get_bind(clause=select(Conversation)) is writer
+        db.commit()
+        assert db.get_bind(clause=select(Conversation)) is reader
+        assert db.scalars(select(Conversation.user_id)).all() == [1]
+
+    assert writer.pool.size() == 1
+    reader.dispose()
+    writer.dispose()
+
+
+def test_upgrade_keeps_rows_referenced_by_foreign_keys(tmp_path):
+    """Test batch table rebuilds succeed on a populated database with FKs enforced"""
+    from alembic import command
+    from alembic.config import Config
+
+    from app.database import ALEMBIC_DIR
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    with engine.begin() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, "0007")
+        conn.execute(text(
+            "INSERT INTO documents (id, filename, content) VALUES (1, 'a.pdf', 'Some text')"
+        ))
+        conn.execute(text(
+            "INSERT INTO ingestion_jobs (filename, path, status, pages_done, document_id) "
+            "VALUES ('a.pdf', '/gone', 'SUCCEEDED', 1, 1)"
+        ))
+
+    upgrade_database(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text(
+            "SELECT t.content FROM documents d JOIN document_texts t ON t.id = d.text_id"
+        )).scalar() == "Some text"
+        assert conn.execute(text("SELECT document_id FROM ingestion_jobs")).scalar() == 1
+    engine.dispose()
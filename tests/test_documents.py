@@ -0,0 +1,352 @@
+"""Test background PDF ingestion"""
+import time
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database import init_db
+from app.main import app
+
+client = TestClient(app)
+
+
+def make_pdf(pages):
+    """A minimal valid PDF with one line of Helvetica text per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        kids.append(len(objects) + 1)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {len(objects) + 2} 0 R "
+            f"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 "
+            f"/BaseFont /Helvetica >> >> >> >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] "
+        f"/Count {len(kids)} >>".encode()
+    )
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return out
+
+
+def wait_for(job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/documents/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_upload_is_ingested_in_the_background(tmp_path, monkeypatch):
+    """Test upload returns 202 with a job and the job reports every page"""
+    import uuid
+
+    init_db()
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "upload_chunk_size", 64)
+
+    # Unique bytes, so an earlier run against the same database is no duplicate
+    pdf = make_pdf([f"Page number {i}" for i in range(1, 6)] + [uuid.uuid4().hex])
+    response = client.post("/documents/upload", files={"file": ("manual.pdf", pdf, "application/pdf")})
+    assert response.status_code == 202
+    assert response.json()["status"] in ("queued", "running", "succeeded")
+
+    job = wait_for(response.json()["job_id"])
+    assert job["status"] == "succeeded", job
+    assert (job["pages_done"], job["pages_total"]) == (6, 6)
+    assert job["document_id"] is not None
+    # The upload is removed once ingested, just after the job is finished
+    deadline = time.monotonic() + 5
+    while list(tmp_path.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(tmp_path.iterdir()) == []
+
+    from app.database import SessionLocal
+    from app.repositories.document_repository import DocumentRepository
+    with SessionLocal() as db:
+        content = DocumentRepository(db).get(job["document_id"], with_text=True).content
+    assert content.split("\n")[:5] == [f"Page number {i}" for i in range(1, 6)]
+
+
+def test_failed_and_rejected_uploads(tmp_path, monkeypatch):
+    """Test unreadable PDFs fail the job and oversized uploads are refused"""
+    init_db()
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+
+    response = client.post("/documents/upload", files={"file": ("bad.pdf", b"not a pdf", "application/pdf")})
+    job = wait_for(response.json()["job_id"])
+    assert job["status"] == "failed" and job["error"]
+    assert job["document_id"] is None
+
+    monkeypatch.setattr(settings, "upload_max_bytes", 10)
+    response = client.post("/documents/upload", files={"file": ("big.pdf", b"x" * 100, "application/pdf")})
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+    # Far over the limit: refused from Content-Length before the form is parsed
+    from app.services.ingestion_service import IngestionService
+
+    async def never_called(self, file):
+        raise AssertionError("upload was parsed")
+
+    monkeypatch.setattr(IngestionService, "enqueue", never_called)
+    response = client.post("/documents/upload", files={"file": ("big.pdf", b"x" * 64 * 1024, "application/pdf")})
+    assert response.status_code == 413
+
+    response = client.post(
+        "/documents/upload",
+        files={"file": ("a.pdf", b"x", "application/pdf")},
+        headers={"Content-Length": "lots"}
+    )
+    assert response.status_code == 400
+
+    assert client.get("/documents/jobs/999999999").status_code == 404
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path):
+    """Test page ranges extracted across processes come back in order"""
+    from app.utils.pdf_extraction import PdfExtractor
+
+    path = tmp_path / "long.pdf"
+    path.write_bytes(make_pdf([f"Page number {i}" for i in range(1, 21)]))
+    extractor = PdfExtractor(processes=2, pages_per_task=3)
+    progress = []
+    try:
+        pages, timed_out = extractor.extract(str(path), on_page=lambda done, total: progress.append((done, total)))
+    finally:
+        extractor.shutdown()
+
+    assert pages == [f"Page number {i}" for i in range(1, 21)]
+    assert timed_out == []
+    assert len(progress) == 7 and progress[-1] == (20, 20)
+
+
+def test_slow_page_times_out_without_stalling_the_rest(tmp_path, monkeypatch):
+    """Test a page over the per-page timeout is skipped and the others kept"""
+    from PyPDF2 import PageObject
+
+    from app.utils import pdf_extraction
+
+    path = tmp_path / "slow.pdf"
+    path.write_bytes(make_pdf(["fast one", "slow page", "fast two"]))
+    original = PageObject.extract_text
+
+    def extract_text(self, *args, **kwargs):
+        text = original(self, *args, **kwargs)
+        if "slow" in text:
+            time.sleep(5)
+        return text
+
+    monkeypatch.setattr(PageObject, "extract_text", extract_text)
+    started = time.monotonic()
+    texts = pdf_extraction.extract_range(str(path), 0, 3, page_timeout=0.2)
+    assert texts == ["fast one", None, "fast two"]
+    assert time.monotonic() - started < 2
+    # The parsed PDF is only kept for a following range of the same file
+    assert pdf_extraction._reader == (None, None)
+    pdf_extraction.extract_range(str(path), 0, 1, page_timeout=None, keep_open=True)
+    assert pdf_extraction._reader[0] == str(path)
+
+
+def test_stuck_extraction_replaces_the_process_pool(tmp_path):
+    """Test a range-level timeout terminates the workers instead of leaking them"""
+    import multiprocessing
+
+    import pytest
+
+    from app.utils.pdf_extraction import PdfExtractor
+
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(make_pdf(["one", "two"]))
+    # Far below a spawned worker's start-up time, so no range finishes in time
+    extractor = PdfExtractor(processes=1, pages_per_task=1, page_timeout=0.001)
+    before = {process.pid for process in multiprocessing.active_children()}
+    try:
+        with pytest.raises(TimeoutError):
+            extractor.extract(str(path))
+        assert extractor._pool is None
+        deadline = time.monotonic() + 5
+        while {process.pid for process in multiprocessing.active_children()} - before:
+            assert time.monotonic() < deadline, "worker processes left running"
+            time.sleep(0.05)
+    finally:
+        extractor.shutdown()
+
+
+def test_duplicate_uploads_share_documents_and_text(tmp_path, monkeypatch):
+    """Test identical bytes reuse the document and identical text is stored once"""
+    import uuid
+
+    from app.database import SessionLocal
+    from app.models.document import Document, DocumentText
+
+    init_db()
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    marker = uuid.uuid4().hex
+    pdf = make_pdf([f"Unique text {marker}"])
+
+    first = client.post("/documents/upload", files={"file": ("a.pdf", pdf, "application/pdf")})
+    document_id = wait_for(first.json()["job_id"])["document_id"]
+    again = client.post("/documents/upload", files={"file": ("again.pdf", pdf, "application/pdf")})
+    assert again.status_code == 200
+    assert again.json() == {"document_id": document_id, "filename": "a.pdf", "duplicate": True}
+    assert list(tmp_path.iterdir()) == []
+
+    # Different bytes, same extracted text: a new document sharing the text row
+    variant = pdf.replace(b"%PDF-1.4\n", b"%PDF-1.4\n%variant\n", 1)
+    response = client.post("/documents/upload", files={"file": ("b.pdf", variant, "application/pdf")})
+    assert response.status_code == 202
+    other_id = wait_for(response.json()["job_id"])["document_id"]
+    assert other_id != document_id
+
+    def text_rows():
+        with SessionLocal() as db:
+            return [
+                (text.id, text.ref_count)
+                for text in db.query(DocumentText).filter(DocumentText.content.contains(marker))
+            ]
+
+    with SessionLocal() as db:
+        text_ids = {db.get(Document, i).text_id for i in (document_id, other_id)}
+    assert len(text_ids) == 1
+    assert text_rows() == [(text_ids.pop(), 2)]
+
+    assert client.delete(f"/documents/{document_id}").status_code == 204
+    assert text_rows()[0][1] == 1
+    assert client.delete(f"/documents/{other_id}").status_code == 204
+    assert text_rows() == []
+    assert client.delete(f"/documents/{other_id}").status_code == 404
+
+
+def test_rag_answers_from_chunks_built_at_ingestion(tmp_path, monkeypatch):
+    """Test ingestion writes chunks with offsets and RAG turns retrieve them"""
+    import re
+    import uuid
+
+    from app.database import SessionLocal
+    from app.models.document import ChunkPosting, Document, DocumentChunk
+    from app.repositories.document_repository import DocumentRepository
+    from app.services.llm_service import LLMService
+
+    async def fake_generate_response(self, messages, **kwargs):
+        return {"content": "test-reply", "tokens": 3}
+
+    init_db()
+    monkeypatch.setattr(LLMService, "generate_response", fake_generate_response)
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    marker = uuid.uuid4().hex
+    pages = [
+        f"Paris is the capital of France {marker} " + "filler words here " * 30,
+        "The weather is mild and rainy in spring " + "more filler text " * 30,
+    ]
+    response = client.post("/documents/upload", files={"file": ("facts.pdf", make_pdf(pages), "application/pdf")})
+    document_id = wait_for(response.json()["job_id"])["document_id"]
+
+    with SessionLocal() as db:
+        document = DocumentRepository(db).get(document_id, with_text=True)
+        chunks = db.query(DocumentChunk).filter_by(text_id=document.text_id).order_by(DocumentChunk.ordinal).all()
+        assert len(chunks) > 1
+        for chunk in chunks:
+            span = document.content[chunk.start_offset:chunk.end_offset]
+            assert re.sub(r"\s+", " ", span) == chunk.content
+            assert chunk.tokens > 0 and chunk.term_count > 0
+
+    # Plain loads (e.g. the duplicate check on every upload) leave the text out
+    from sqlalchemy import inspect
+
+    with SessionLocal() as db:
+        document = DocumentRepository(db).get(document_id)
+        assert "text" not in inspect(document).dict
+        assert DocumentRepository(db).get_by_sha256(document.sha256) is document
+        assert "text" not in inspect(document).dict
+
+    conversation_id = client.post("/conversations/", json={
+        "first_message": "About the document", "mode": "rag", "document_id": document_id
+    }).json()["conversation_id"]
+    response = client.post(f"/conversations/{conversation_id}/rag", json={"content": "What is the capital of France?"})
+    assert response.status_code == 200
+    assert response.json()["reply"] == "test-reply"
+    assert marker in response.json()["sources"][0]
+
+    # Deleting the only document using the text drops its index with it
+    with SessionLocal() as db:
+        text_id = db.get(Document, document_id).text_id
+        assert db.query(ChunkPosting).filter_by(text_id=text_id, term="capital").count() == 1
+    assert client.delete(f"/documents/{document_id}").status_code == 204
+    with SessionLocal() as db:
+        assert db.query(ChunkPosting).filter_by(text_id=text_id).count() == 0
+        assert db.query(DocumentChunk).filter_by(text_id=text_id).count() == 0
+
+    no_document = client.post("/conversations/", json={"first_message": "hi"}).json()["conversation_id"]
+    response = client.post(f"/conversations/{no_document}/rag", json={"content": "anything?"})
+    assert response.status_code == 404
+
+
+def test_running_jobs_heartbeat_so_restarts_do_not_requeue_them(monkeypatch):
+    """Test a live worker's job stays RUNNING while a restart requeues stale ones"""
+    import threading
+    from datetime import datetime, timedelta
+
+    from app.database import SessionLocal
+    from app.models.ingestion_job import IngestionJob, IngestionStatus
+    from app.repositories.ingestion_job_repository import IngestionJobRepository
+    from app.services import ingestion_service
+    from app.services.ingestion_service import IngestionPool
+
+    init_db()
+    monkeypatch.setattr(settings, "ingestion_heartbeat_seconds", 0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_ingest(self, job_id):
+        self.job_repo.claim(job_id)
+        started.set()
+        release.wait(10)
+
+    monkeypatch.setattr(ingestion_service.DocumentService, "ingest", slow_ingest)
+    with SessionLocal() as db:
+        live = IngestionJob(filename="live.pdf", path="/nonexistent", status=IngestionStatus.QUEUED)
+        dead = IngestionJob(filename="dead.pdf", path="/nonexistent", status=IngestionStatus.RUNNING)
+        db.add_all([live, dead])
+        db.commit()
+        live_id, dead_id = live.id, dead.id
+
+    pool = IngestionPool(workers=1, max_pending=10)
+    try:
+        pool.submit(live_id)
+        assert started.wait(5)
+        an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        with SessionLocal() as db:
+            db.query(IngestionJob).filter(IngestionJob.id.in_([live_id, dead_id])).update(
+                {"updated_at": an_hour_ago}, synchronize_session=False
+            )
+            db.commit()
+        time.sleep(0.3)
+
+        with SessionLocal() as db:
+            queued = IngestionJobRepository(db).requeue_unfinished(
+                datetime.utcnow() - timedelta(minutes=10)
+            )
+            assert dead_id in queued and live_id not in queued
+            assert db.get(IngestionJob, live_id).status == IngestionStatus.RUNNING
+    finally:
+        release.set()
+        pool.shutdown()
+        # Leave nothing for a later startup to resume
+        with SessionLocal() as db:
+            db.query(IngestionJob).filter(IngestionJob.id.in_([live_id, dead_id])).update(
+                {"status": IngestionStatus.FAILED}, synchronize_session=False
+            )
+            db.commit()
@@ -0,0 +1,64 @@
+"""Test rate-limit-aware LLM request scheduling"""
+import asyncio
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler, Priority, parse_duration
+
+
+def test_parse_duration():
+    """Test parsing of Groq rate-limit reset headers"""
+    assert parse_duration("7.66s") == pytest.approx(7.66)
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("3") == 3.0
+    assert parse_duration(None) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_jump_the_queue():
+    """Test that queued interactive work is released before batch work"""
+    scheduler = LLMScheduler(rpm_limit=1, tpm_limit=10000)
+    await scheduler.acquire(100)  # drains the single request slot
+
+    order = []
+
+    async def run(name, priority):
+        await scheduler.acquire(100, priority)
+        order.append(name)
+
+    batch = asyncio.ensure_future(run("batch", Priority.BATCH))
+    interactive = asyncio.ensure_future(run("interactive", Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    assert order == []
+
+    # Budget returns; only one request fits at a time
+    scheduler.requests.refund(1)
+    scheduler._dispatch()
+    await asyncio.sleep(0)
+    assert order == ["interactive"]
+
+    scheduler.requests.refund(1)
+    scheduler._dispatch()
+    await asyncio.gather(batch, interactive)
+    assert order == ["interactive", "batch"]
+    assert scheduler.stats()["queue_wait"]["batch"]["admitted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_headers_and_usage_adjust_token_budget():
+    """Test that server headers clamp the budget and usage refunds estimates"""
+    scheduler = LLMScheduler(rpm_limit=30, tpm_limit=10000)
+
+    scheduler.update_from_headers(200, {
+        "x-ratelimit-remaining-tokens": "2000",
+        "x-ratelimit-reset-tokens": "5s",
+    })
+    assert scheduler.tokens.level <= 2000
+
+    await scheduler.acquire(1500)
+    scheduler.settle(1500, 300)
+    assert scheduler.tokens.level == pytest.approx(1700, abs=5)
+
+    scheduler.update_from_headers(429, {"retry-after": "2"})
+    assert scheduler.requests.level < 0
+    assert scheduler.stats()["rate_limited"] == 1
@@ -1,6 +1,21 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from app.services.llm_service import LLMService
+from app.config import settings
+from app.models.conversation import ConversationMode
+from app.services.llm_router import ModelRouter
+from app.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from app.utils.latency import get_latency_tracker
+from app.utils.llm_cache import LLMResponseCache, get_llm_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    """Start every test with an empty shared response cache"""
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.clear()
 
 
 @pytest.mark.asyncio
@@ -12,7 +27,7 @@ async def test_generate_response_success():
     mock_response.choices = [Mock(message=Mock(content="Hello! How can I help?"))]
     mock_response.usage = Mock(total_tokens=25)
     
-    with patch.object(llm_service.client.chat.completions, 'create', return_value=mock_response):
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=mock_response):
         result = await llm_service.generate_response(
             [{"role": "user", "content": "Hi"}]
         )
@@ -30,7 +45,7 @@ async def test_generate_response_with_system_message():
     mock_response.choices = [Mock(message=Mock(content="Response"))]
     mock_response.usage = Mock(total_tokens=10)
     
-    with patch.object(llm_service.client.chat.completions, 'create', return_value=mock_response) as mock_create:
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=mock_response) as mock_create:
         await llm_service.generate_response(
             [{"role": "user", "content": "Test"}]
         )
@@ -46,8 +61,295 @@ async def test_generate_response_api_error():
     """Test error handling when API fails"""
     llm_service = LLMService()
     
-    with patch.object(llm_service.client.chat.completions, 'create', side_effect=Exception("API Error")):
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, side_effect=Exception("API Error")):
         with pytest.raises(Exception, match="Failed to generate response"):
             await llm_service.generate_response(
                 [{"role": "user", "content": "Hi"}]
-            )
\ No newline at end of file
+            )
+
+
+@pytest.mark.asyncio
+async def test_services_share_pooled_client():
+    """Test that every LLMService reuses the process-wide client"""
+    assert LLMService().client is LLMService().client
+
+
+@pytest.mark.asyncio
+async def test_stream_response_yields_deltas():
+    """Test that streamed chunks are relayed and usage is reported"""
+    llm_service = LLMService()
+
+    async def fake_stream():
+        for piece in ["Hel", "lo"]:
+            yield Mock(choices=[Mock(delta=Mock(content=piece))], x_groq=None)
+        yield Mock(choices=[], x_groq=Mock(usage=Mock(total_tokens=12)))
+
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=fake_stream()):
+        events = [
+            event async for event in llm_service.stream_response(
+                [{"role": "user", "content": "Hi"}]
+            )
+        ]
+
+    assert [e["content"] for e in events if e["event"] == "delta"] == ["Hel", "lo"]
+    assert events[-1]["content"] == "Hello"
+    assert events[-1]["tokens"] == 12
+
+
+
+@pytest.mark.asyncio
+async def test_generate_response_cache_hit():
+    """Test that identical requests are served from the cache"""
+    llm_service = LLMService(cache=LLMResponseCache())
+
+    mock_response = Mock()
+    mock_response.choices = [Mock(message=Mock(content="Cached answer"))]
+    mock_response.usage = Mock(total_tokens=30)
+
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=mock_response) as mock_create:
+        first = await llm_service.generate_response([{"role": "user", "content": "FAQ"}])
+        second = await llm_service.generate_response([{"role": "user", "content": "  FAQ\n"}])
+        third = await llm_service.generate_response(
+            [{"role": "user", "content": "FAQ"}], use_cache=False
+        )
+
+    assert mock_create.await_count == 2
+    assert first["cached"] is False
+    assert second["content"] == "Cached answer"
+    assert second["cached"] is True
+    assert third["cached"] is False
+    assert llm_service.cache.stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used_and_expired():
+    """Test LRU eviction under the entry cap and TTL expiry"""
+    cache = LLMResponseCache(max_entries=2)
+    cache.set("a", {"content": "A"})
+    cache.set("b", {"content": "B"})
+    cache.get("a")
+    cache.set("c", {"content": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"content": "A"}
+
+    expired = LLMResponseCache(ttl_seconds=0)
+    expired.set("a", {"content": "A"})
+    assert expired.get("a") is None
+
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced():
+    """Test that concurrent identical calls share one upstream request"""
+    llm_service = LLMService(cache=LLMResponseCache())
+    release = asyncio.Event()
+
+    async def slow_create(**kwargs):
+        await release.wait()
+        return Mock(
+            choices=[Mock(message=Mock(content="Shared"))],
+            usage=Mock(total_tokens=5)
+        )
+
+    messages = [{"role": "user", "content": "Popular prompt"}]
+    with patch.object(llm_service.client.chat.completions, 'create', side_effect=slow_create) as mock_create:
+        calls = [
+            asyncio.ensure_future(llm_service.generate_response(messages, use_cache=False))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*calls)
+
+    assert mock_create.call_count == 1
+    assert {r["content"] for r in results} == {"Shared"}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_failure_does_not_poison_retries():
+    """Test that a shared failure reaches all waiters and the next call retries"""
+    llm_service = LLMService(cache=LLMResponseCache())
+    messages = [{"role": "user", "content": "Flaky prompt"}]
+
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, side_effect=Exception("boom")):
+        results = await asyncio.gather(
+            llm_service.generate_response(messages),
+            llm_service.generate_response(messages),
+            return_exceptions=True
+        )
+    assert all(isinstance(r, Exception) for r in results)
+
+    mock_response = Mock()
+    mock_response.choices = [Mock(message=Mock(content="Recovered"))]
+    mock_response.usage = Mock(total_tokens=3)
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=mock_response):
+        result = await llm_service.generate_response(messages)
+    assert result["content"] == "Recovered"
+
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged():
+    """Test that a request slower than the latency percentile gets a hedge"""
+    llm_service = LLMService(cache=LLMResponseCache())
+    llm_service.model = "hedge-test-model"
+    tracker = get_latency_tracker(llm_service.model)
+    for _ in range(settings.llm_hedge_min_samples):
+        tracker.record(0.01)
+
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            await asyncio.sleep(10)  # the straggler
+        return Mock(
+            choices=[Mock(message=Mock(content="fast"))],
+            usage=Mock(total_tokens=4)
+        )
+
+    with patch.object(llm_service.client.chat.completions, 'create', side_effect=create):
+        result = await asyncio.wait_for(
+            llm_service.generate_response([{"role": "user", "content": "Hedge me"}]),
+            timeout=2
+        )
+
+    assert result["content"] == "fast"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_losing_hedge_refunds_its_reservation(monkeypatch):
+    """Test that the reservation of a cancelled straggler is given back"""
+    from app.services import llm_service as llm_module
+
+    class RecordingScheduler:
+        def __init__(self):
+            self.reserved = []
+            self.settled = []
+
+        async def acquire(self, estimated, priority):
+            self.reserved.append(estimated)
+
+        def try_acquire(self, estimated):
+            self.reserved.append(estimated)
+            return True
+
+        def settle(self, estimated, actual):
+            self.settled.append(actual)
+
+    scheduler = RecordingScheduler()
+    monkeypatch.setattr(llm_module, "get_llm_scheduler", lambda: scheduler)
+    llm_service = LLMService(cache=LLMResponseCache())
+    llm_service.model = "hedge-refund-model"
+    tracker = get_latency_tracker(llm_service.model)
+    for _ in range(settings.llm_hedge_min_samples):
+        tracker.record(0.01)
+
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            await asyncio.sleep(10)  # the straggler, cancelled once the hedge wins
+        return Mock(
+            choices=[Mock(message=Mock(content="fast"))],
+            usage=Mock(total_tokens=4)
+        )
+
+    with patch.object(llm_service.client.chat.completions, 'create', side_effect=create):
+        await asyncio.wait_for(
+            llm_service.generate_response([{"role": "user", "content": "Hedge me"}]),
+            timeout=2
+        )
+
+    assert len(scheduler.reserved) == 2
+    # The winner is charged its real usage, the cancelled straggler nothing
+    assert sorted(scheduler.settled) == [0, 4]
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_uses_fallback_model(monkeypatch):
+    """Test that an open circuit routes to the fallback model"""
+    llm_service = LLMService(cache=LLMResponseCache())
+    llm_service.model = "breaker-test-model"
+    monkeypatch.setattr(settings, "llm_fallback_model", "breaker-fallback-model")
+
+    breaker = get_circuit_breaker(llm_service.model)
+    for _ in range(breaker.min_requests):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    mock_response = Mock()
+    mock_response.choices = [Mock(message=Mock(content="from fallback"))]
+    mock_response.usage = Mock(total_tokens=8)
+    with patch.object(llm_service.client.chat.completions, 'create', new_callable=AsyncMock, return_value=mock_response) as mock_create:
+        result = await llm_service.generate_response([{"role": "user", "content": "Hi"}])
+
+    assert result["model"] == "breaker-fallback-model"
+    assert mock_create.call_args.kwargs["model"] == "breaker-fallback-model"
+
+
+def test_circuit_breaker_half_open_recovery():
+    """Test open -> half-open trial -> closed transitions"""
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=2, cooldown_seconds=0)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.allow() is True      # cooldown elapsed: one trial call
+    assert breaker.allow() is False     # further calls wait for the trial
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_router_sends_easy_turns_to_fastest_model():
+    """Test routing by mode, prompt size and observed latency"""
+    router = ModelRouter(
+        primary_model="router-big",
+        fast_models=["router-small"],
+        max_fast_tokens=50
+    )
+    get_latency_tracker("router-big").record(3.0)
+    get_latency_tracker("router-small").record(0.4)
+
+    short = [{"role": "user", "content": "Hi!"}]
+    long = [{"role": "user", "content": "word " * 200}]
+
+    assert router.route(short) == {"model": "router-small", "reason": "short_prompt"}
+    assert router.route(long) == {"model": "router-big", "reason": "long_prompt"}
+    assert router.route(short, ConversationMode.RAG) == {"model": "router-big", "reason": "rag"}
+
+
+@pytest.mark.asyncio
+async def test_request_cancelled_while_queued_frees_half_open_trial(monkeypatch):
+    """Test that a trial call cancelled in the scheduler queue does not wedge the circuit"""
+    from app.services import llm_service as llm_module
+
+    class StuckScheduler:
+        async def acquire(self, estimated, priority):
+            await asyncio.Event().wait()
+
+    monkeypatch.setattr(llm_module, "get_llm_scheduler", lambda: StuckScheduler())
+    llm_service = LLMService(cache=LLMResponseCache())
+    breaker = CircuitBreaker(error_threshold=0.5, min_requests=2, cooldown_seconds=0)
+    breaker.record_failure()
+    breaker.record_failure()
+    monkeypatch.setattr(llm_module, "get_circuit_breaker", lambda model: breaker)
+
+    async def consume_stream():
+        async for _ in llm_service.stream_response([{"role": "user", "content": "Hi"}]):
+            pass
+
+    # _complete runs behind the single-flight shield, so cancel it directly
+    for request in (
+        lambda: llm_service._complete([{"role": "user", "content": "Hi"}]),
+        consume_stream,
+    ):
+        task = asyncio.ensure_future(request())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The next caller gets the trial slot
+        assert breaker.allow() is True
+        breaker.abandon()
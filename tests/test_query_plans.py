@@ -0,0 +1,70 @@
+"""Test that the hot repository queries are served by indexes"""
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.database import upgrade_database
+from app.models.conversation import ConversationMode
+from app.repositories.conversation_repository import AsyncConversationRepository
+from app.repositories.document_repository import AsyncDocumentRepository
+from app.repositories.message_repository import AsyncMessageRepository
+
+# A plan step that reads a whole table or index, or sorts in a temp b-tree
+FULL_SCAN = re.compile(
+    r"^SCAN (conversations|messages|documents|document_texts|document_chunks|chunk_postings)\b"
+    r"|USE TEMP B-TREE"
+)
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_do_not_scan(tmp_path):
+    path = tmp_path / "plans.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    upgrade_database(sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        conversations = AsyncConversationRepository(db)
+        messages = AsyncMessageRepository(db)
+        documents = AsyncDocumentRepository(db)
+
+        await conversations.get(1)
+        await conversations.list_page(1, 20)
+        await conversations.list_page(
+            1, 20,
+            after=(datetime.utcnow(), 10),
+            mode=ConversationMode.RAG,
+            document_id=1
+        )
+        await messages.get(1, 1)
+        await messages.get_by_conversation(1)
+        await messages.get_page(1, 50, before=(datetime.utcnow(), 10))
+        await messages.count_by_conversation(1)
+        await messages.get_pinned(1)
+        await messages.get_summary(1)
+        async for _ in messages.iter_recent(1, after_id=5):
+            pass
+        # RAG retrieval reads only the question terms' postings
+        await documents.get_index_stats(1)
+        await documents.get_postings(1, ["capital", "france"])
+        await documents.get_chunks(1, chunk_ids=[3, 7, 9])
+        await documents.get_chunks(1, limit=3)
+    await async_engine.dispose()
+
+    assert len(captured) == 14
+    with sync_engine.connect() as conn:
+        for statement, parameters in captured:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            details = [row[-1] for row in plan]
+            assert not any(FULL_SCAN.search(d) for d in details), (statement, details)
+    sync_engine.dispose()
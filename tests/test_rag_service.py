@@ -50,20 +50,27 @@ def test_rag_retrieval():
 
 
 def test_rag_relevance_scoring():
-    """Test that relevance scoring works correctly"""
+    """Test that BM25 ranks by relevance, stems terms and ignores stopwords"""
     rag = RAGService()
-    
-    query_keywords = {"capital", "france"}
-    
-    # Chunk with high relevance
-    chunk1 = "Paris is the capital of France"
-    score1 = rag._calculate_relevance(query_keywords, chunk1)
-    
-    # Chunk with low relevance
-    chunk2 = "The weather is nice today"
-    score2 = rag._calculate_relevance(query_keywords, chunk2)
-    
-    # Score should be higher for more relevant chunk
-    assert score1 > score2
-    assert score1 >= 2  # Should match both "capital" and "france"
-    assert score2 == 0  # Should match nothing
+
+    assert rag.query_terms("What is the capital of France?") == ["capital", "france"]
+
+    chunks = [
+        "The weather is nice today",                    # only stopwords in common
+        "Capitals of Europe include Berlin and Rome",   # "capitals" stems to "capital"
+        "Paris is the capital of France",               # both terms
+    ]
+    ranked = rag.retrieve_relevant_chunks("What is the capital of France?", chunks, top_k=3)
+
+    # Score should be higher for more relevant chunk; no match is not returned
+    assert ranked == [chunks[2], chunks[1]]
+
+    # A rarer term outweighs a common one
+    postings = {
+        "capital": [(1, 1, 6), (2, 1, 6), (3, 1, 6)],
+        "france": [(3, 1, 6)],
+        "europe": [(2, 1, 6), (4, 1, 6), (5, 1, 6), (6, 1, 6)],
+    }
+    scores = dict(rag.rank(postings, chunk_count=10, term_count=60, top_k=3))
+    assert scores[3] > scores[2] > scores[1] > 0
+    assert [chunk_id for chunk_id, _ in rag.rank(postings, 10, 60, top_k=1)] == [3]
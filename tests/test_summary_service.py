@@ -0,0 +1,119 @@
+"""Test rolling conversation summarization"""
+import pytest
+import pytest_asyncio
+
+from app.config import settings
+from app.database import AsyncSessionLocal, init_db
+from app.models.message import MessageRole
+from app.repositories.conversation_repository import AsyncConversationRepository
+from app.repositories.message_repository import AsyncMessageRepository
+from app.services.summary_service import SummaryService
+from app.utils.context_manager import ContextBuilder
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_response(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        return {"content": f"summary #{len(self.prompts)}", "tokens": 10}
+
+
+@pytest_asyncio.fixture
+async def db(monkeypatch):
+    init_db()
+    monkeypatch.setattr(settings, "summary_trigger_tokens", 50)
+    monkeypatch.setattr(settings, "summary_keep_recent_tokens", 40)
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.mark.asyncio
+async def test_old_turns_fold_into_incremental_summary(db):
+    """Test that old turns are summarized once and replaced in the context"""
+    conversation = await AsyncConversationRepository(db).create(user_id=1)
+    messages = AsyncMessageRepository(db)
+    for i in range(12):
+        role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+        await messages.create(conversation.id, role, f"turn {i}", tokens=6)
+
+    llm = FakeLLM()
+    service = SummaryService(db, llm_service=llm)
+    summary = await service.summarize(conversation.id)
+
+    assert summary.content == "summary #1"
+    assert "turn 0" in llm.prompts[0]
+    assert "turn 11" not in llm.prompts[0]
+
+    # Nothing new to fold yet
+    assert await service.summarize(conversation.id) is None
+
+    history = await ContextBuilder(messages, max_tokens=1000).build(conversation.id)
+    assert history[0]["content"].endswith("summary #1")
+    assert "turn 0" not in [m["content"] for m in history]
+    assert history[-1]["content"] == "turn 11"
+
+    # Later turns are folded on top of the previous summary, not re-read
+    for i in range(12, 20):
+        await messages.create(conversation.id, MessageRole.USER, f"turn {i}", tokens=6)
+    updated = await service.summarize(conversation.id)
+    assert updated.id == summary.id
+    assert "summary #1" in llm.prompts[1]
+    assert "turn 0" not in llm.prompts[1]
+
+
+@pytest.mark.asyncio
+async def test_long_backlog_is_folded_in_capped_passes(db, monkeypatch):
+    """Test that a tail far over the fold cap is summarized a slice at a time"""
+    monkeypatch.setattr(settings, "summary_max_fold_tokens", 100)
+    conversation = await AsyncConversationRepository(db).create(user_id=1)
+    messages = AsyncMessageRepository(db)
+    created = [
+        await messages.create(conversation.id, MessageRole.USER, f"turn {i}", tokens=6)
+        for i in range(200)
+    ]
+
+    llm = FakeLLM()
+    service = SummaryService(db, llm_service=llm)
+    first = await service.summarize(conversation.id)
+    # 10 tokens per message with overhead: the oldest ten fit the cap
+    assert first.summary_until_id == created[9].id
+    assert llm.prompts[0].count("User: turn") == 10
+    assert "User: turn 0\n" in llm.prompts[0]
+
+    while await service.summarize(conversation.id) is not None:
+        assert llm.prompts[-1].count("User: turn") <= 10
+    summary = await messages.get_summary(conversation.id)
+    # Everything but the four most recent messages ends up folded
+    assert len(llm.prompts) == 20
+    assert summary.summary_until_id == created[-5].id
+
+
+@pytest.mark.asyncio
+async def test_concurrent_summaries_share_one_row(db):
+    """Test that racing summarizers upsert the same row instead of adding one each"""
+    import asyncio
+
+    from sqlalchemy import func, select
+
+    from app.models.message import Message
+
+    conversation = await AsyncConversationRepository(db).create(user_id=1)
+    first = await AsyncMessageRepository(db).create(conversation.id, MessageRole.USER, "hi", tokens=1)
+
+    async def save(content):
+        async with AsyncSessionLocal() as session:
+            return await AsyncMessageRepository(session).save_summary(
+                conversation.id, content=content, until_id=first.id
+            )
+
+    saved = await asyncio.gather(save("summary a"), save("summary b"))
+    assert saved[0].id == saved[1].id
+    count = await db.scalar(
+        select(func.count()).where(Message.conversation_id == conversation.id, Message.is_summary)
+    )
+    assert count == 1
+    summary = await AsyncMessageRepository(db).get_summary(conversation.id)
+    assert summary.content in ("summary a", "summary b")
+    assert summary.summary_until_id == first.id
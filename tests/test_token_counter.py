@@ -0,0 +1,64 @@
+"""Test token counting and per-message stored counts"""
+import pytest
+
+from app.utils.token_counter import (
+    count_prompt_tokens,
+    count_tokens,
+    heuristic_count,
+)
+
+
+def test_heuristic_counts_are_close_to_bpe():
+    """Test the fallback estimator on typical English text"""
+    assert heuristic_count("") == 0
+    assert heuristic_count("Hello world") == 2
+    assert heuristic_count("Hello, world!") == 4
+    # Long words split into several tokens
+    assert heuristic_count("internationalization") > 1
+    # Numbers are grouped in threes
+    assert heuristic_count("1234567") == 3
+
+
+def test_counts_are_memoized():
+    """Test that repeated texts are not re-tokenized"""
+    text = "A sentence that is counted twice."
+    before = count_tokens.cache_info().hits
+    count_tokens(text)
+    count_tokens(text)
+    assert count_tokens.cache_info().hits > before
+
+
+def test_prompt_count_uses_stored_message_tokens():
+    """Test that stored per-message counts are used instead of recounting"""
+    messages = [{"role": "user", "content": "ignored", "tokens": 100}]
+    assert count_prompt_tokens(messages) > 100
+
+
+
+def test_exact_counts_come_from_configured_tokenizer(tmp_path, monkeypatch):
+    """Test that a tokenizer.json at settings.tokenizer_path replaces the heuristic"""
+    tokenizers = pytest.importorskip("tokenizers")
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    from app.config import settings
+    from app.utils import token_counter
+
+    tokenizer = tokenizers.Tokenizer(
+        WordLevel({"[UNK]": 0, "hello": 1, "world": 2, "!": 3}, unk_token="[UNK]")
+    )
+    tokenizer.pre_tokenizer = Whitespace()
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+
+    monkeypatch.setattr(settings, "tokenizer_path", str(path))
+    monkeypatch.setattr(token_counter, "_tokenizer", None)
+    monkeypatch.setattr(token_counter, "_tokenizer_loaded", False)
+    count_tokens.cache_clear()
+    try:
+        # Word-level vocabulary: one token per word or mark, unlike the heuristic
+        assert count_tokens("hello world !") == 3
+        assert count_tokens("internationalization") == 1
+        assert heuristic_count("internationalization") > 1
+    finally:
+        count_tokens.cache_clear()